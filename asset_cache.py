@@ -0,0 +1,356 @@
+# Shared asset caches - Rally House
+#
+# Process-wide, thread-safe caches for decoded jersey assets so that both the
+# standard (generate.py) and curved (curved_generate.py) engines reuse work
+# across rows instead of re-decoding the same files for every order.
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from PIL import Image, ImageFont
+
+from job_log import log
+from raw_store import load_rgba
+
+DEFAULT_DIGIT_CACHE_MB = 1024
+DEFAULT_FONT_CACHE_ENTRIES = 256
+DEFAULT_TILE_CACHE_MB = 512
+DEFAULT_NAMEPLATE_CACHE_MB = 128
+DEFAULT_GLYPH_CACHE_MB = 64
+DEFAULT_OVERLAY_CACHE_ENTRIES = 8
+NUMBER_FOLDERS = ("number_front", "number_back", "number_shoulder")
+MIP_DIRNAME = "_mips"
+MIP_MANIFEST = "manifest.json"
+MIP_FACTORS = (2, 4, 8)
+
+
+def _budget_from_env(var_name: str, default_mb: int) -> int:
+    value = os.environ.get(var_name)
+    if value:
+        try:
+            return max(0, int(float(value) * 1024 * 1024))
+        except ValueError:
+            print(f"[WARN] Invalid {var_name} value '{value}', using {default_mb} MB.")
+    return default_mb * 1024 * 1024
+
+
+def _int_from_env(var_name: str, default: int) -> int:
+    value = os.environ.get(var_name)
+    if value:
+        try:
+            return max(0, int(value))
+        except ValueError:
+            print(f"[WARN] Invalid {var_name} value '{value}', using {default}.")
+    return default
+
+
+def image_nbytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by the summed sizeof() of its values.
+
+    With image_nbytes the capacity is a byte budget; with a constant sizeof of
+    1 it is an entry count. Values are shared between callers and must be
+    treated as read-only.
+    """
+
+    def __init__(self, capacity: int, sizeof: Callable[[object], int]):
+        self.capacity = capacity
+        self._sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[object]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: object) -> None:
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.used -= self._sizes.pop(key)
+                del self._entries[key]
+            if size > self.capacity:
+                return
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.used += size
+            self._evict_locked()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], object]) -> object:
+        value = self.get(key)
+        if value is None:
+            # Decode outside the lock; a concurrent duplicate load is harmless.
+            value = loader()
+            self.put(key, value)
+        return value
+
+    def resize(self, capacity: int) -> None:
+        with self._lock:
+            self.capacity = capacity
+            self._evict_locked()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.used = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "used": self.used,
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _evict_locked(self) -> None:
+        while self.used > self.capacity and self._entries:
+            old_key, _ = self._entries.popitem(last=False)
+            self.used -= self._sizes.pop(old_key)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def mip_path(number_folder: str, digit: str, factor: int) -> str:
+    if factor == 1:
+        return os.path.join(number_folder, f"{digit}.png")
+    return os.path.join(number_folder, MIP_DIRNAME, str(factor), f"{digit}.png")
+
+
+_manifest_lock = threading.Lock()
+_manifests: Dict[str, Tuple[int, Dict[str, Dict]]] = {}
+
+
+def _validated_manifest(number_folder: str, manifest_path: str) -> Dict[str, Dict]:
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as handle:
+            raw = json.load(handle)
+    except (OSError, ValueError) as exc:
+        log(f"[WARN] Ignoring unreadable mip manifest {manifest_path}: {exc}")
+        return {}
+
+    valid: Dict[str, Dict] = {}
+    for filename, entry in (raw.get("files") or {}).items():
+        source = os.path.join(number_folder, filename)
+        try:
+            st = os.stat(source)
+        except OSError:
+            continue
+        # Cheap stat check first; only rehash when the file looks touched.
+        unchanged = st.st_size == entry.get("size") and st.st_mtime_ns == entry.get("mtime_ns")
+        if unchanged or file_sha256(source) == entry.get("sha256"):
+            valid[filename] = entry
+    return valid
+
+
+def load_mip_manifest(number_folder: str) -> Dict[str, Dict]:
+    """Return the still-valid entries of a folder's compiled mip manifest."""
+    folder = os.path.normpath(number_folder)
+    manifest_path = os.path.join(folder, MIP_DIRNAME, MIP_MANIFEST)
+    try:
+        mtime_ns = os.stat(manifest_path).st_mtime_ns
+    except OSError:
+        return {}
+
+    with _manifest_lock:
+        cached = _manifests.get(folder)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+
+    entries = _validated_manifest(folder, manifest_path)
+    with _manifest_lock:
+        _manifests[folder] = (mtime_ns, entries)
+    return entries
+
+
+def pick_mip_factor(number_folder: str, digits: List[str], target_size: Tuple[int, int]) -> int:
+    """Smallest compiled level whose digit composite still covers target_size."""
+    manifest = load_mip_manifest(number_folder)
+    if not manifest:
+        return 1
+    entries = [manifest.get(f"{d}.png") for d in digits]
+    if not entries or any(entry is None for entry in entries):
+        return 1
+
+    target_width, target_height = target_size
+    # Single digits are laid out on a canvas twice their width.
+    width_multiplier = 2 if len(digits) == 1 else 1
+    for factor in sorted(MIP_FACTORS, reverse=True):
+        sizes = [entry.get("levels", {}).get(str(factor)) for entry in entries]
+        if any(size is None for size in sizes):
+            continue
+        width = sum(w for w, _ in sizes) * width_multiplier
+        height = max(h for _, h in sizes)
+        if width >= target_width and height >= target_height:
+            return factor
+    return 1
+
+
+# Decoded digit PNGs keyed by (number folder, digit, mip factor, file mtime). A
+# full-size digit is ~1931x2960 RGBA, and one jersey touches the same few up to
+# six times; an edited PNG misses its old entry like an edited font does.
+digit_cache = LRUCache(_budget_from_env("JERSEY_DIGIT_CACHE_MB", DEFAULT_DIGIT_CACHE_MB), image_nbytes)
+
+
+def set_digit_cache_budget(max_bytes: int) -> None:
+    digit_cache.resize(max_bytes)
+
+
+def load_digit_image(number_folder: str, digit: str, factor: int = 1) -> Image.Image:
+    path = mip_path(number_folder, digit, factor)
+    key = (os.path.normpath(number_folder), digit, factor, os.stat(path).st_mtime_ns)
+
+    def _load() -> Image.Image:
+        return load_rgba(path)
+
+    return digit_cache.get_or_load(key, _load)
+
+
+def load_digit_images(
+    number_folder: str, digits: List[str], target_size: Optional[Tuple[int, int]] = None
+) -> List[Image.Image]:
+    """Decoded digit images for a number.
+
+    When target_size is given and the folder has a compiled mip pack (see
+    compile_assets.py), the smallest level still larger than the box is used.
+    """
+    factor = pick_mip_factor(number_folder, digits, target_size) if target_size else 1
+    return [load_digit_image(number_folder, d, factor) for d in digits]
+
+
+# FreeType font instances keyed by (path, size, file mtime), bounded by count.
+# Shared by every nameplate renderer so workers reuse one parsed .otf per size.
+font_cache = LRUCache(_int_from_env("JERSEY_FONT_CACHE_ENTRIES", DEFAULT_FONT_CACHE_ENTRIES), lambda _font: 1)
+
+
+def load_font(font_path: str, size: int) -> ImageFont.FreeTypeFont:
+    key = (font_path, size, os.stat(font_path).st_mtime_ns)
+    return font_cache.get_or_load(key, lambda: ImageFont.truetype(font_path, size))
+
+
+def font_cache_stats() -> Dict[str, int]:
+    return font_cache.stats()
+
+
+# Finished number tiles (composited, bordered and rotated for one coords.json
+# box). Keys carry the box geometry, border config and digit_stamp(), so editing
+# coords.json or a digit PNG naturally misses the old tiles. JERSEY_NUMBER_TILES selects the mode:
+#   lazy (default) - build each tile on first use, then reuse it
+#   prebuild       - also build every 0-99 / 00-09 tile per team before the batch
+#                    (thread backend; worker processes build lazily)
+#   off            - always composite from digits
+NUMBER_TILE_MODES = ("lazy", "prebuild", "off")
+TILE_NUMBERS = tuple(str(n) for n in range(100)) + tuple(f"0{n}" for n in range(10))
+number_tile_cache = LRUCache(_budget_from_env("JERSEY_TILE_CACHE_MB", DEFAULT_TILE_CACHE_MB), image_nbytes)
+
+
+def number_tile_mode() -> str:
+    mode = os.environ.get("JERSEY_NUMBER_TILES", "lazy").strip().lower()
+    return mode if mode in NUMBER_TILE_MODES else "lazy"
+
+
+def digit_stamp(number_folder: str, number_str: str) -> Tuple[int, ...]:
+    """mtime_ns of the digit PNGs number_str is built from, for tile cache keys."""
+    return tuple(os.stat(mip_path(number_folder, digit, 1)).st_mtime_ns for digit in str(number_str))
+
+
+def get_number_tile(key: Hashable, render: Callable[[], Image.Image]) -> Image.Image:
+    if number_tile_mode() == "off":
+        return render()
+    return number_tile_cache.get_or_load(key, render)
+
+
+def config_key(config) -> str:
+    """Hashable, order-independent form of a coords.json config (dict, list or None)."""
+    return json.dumps(config, sort_keys=True, default=str)
+
+
+_digest_lock = threading.Lock()
+_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file, recomputed only when its size or mtime changes."""
+    st = os.stat(path)
+    key = (os.path.normpath(path), st.st_size, st.st_mtime_ns)
+    with _digest_lock:
+        digest = _digests.get(key)
+    if digest is None:
+        digest = file_sha256(path)
+        with _digest_lock:
+            _digests[key] = digest
+    return digest
+
+
+# Rendered nameplate layers keyed by (renderer, uppercased text, font file
+# hash, normalized NamePlate config). The same player name is ordered across
+# colorways and youth/adult sizes, so repeats skip all glyph work.
+nameplate_cache = LRUCache(_budget_from_env("JERSEY_NAMEPLATE_CACHE_MB", DEFAULT_NAMEPLATE_CACHE_MB), image_nbytes)
+
+
+def get_nameplate(key: Hashable, render: Callable[[], Image.Image]) -> Image.Image:
+    return nameplate_cache.get_or_load(key, render)
+
+
+# Rasterized nameplate letters, keyed by font file hash, size and char: coverage
+# masks (plain or outlined) per subpixel pen position, and coloured fan/circle
+# sprites per layout cell. Values are (image, offset from the pen position);
+# see text_layout.
+glyph_cache = LRUCache(_budget_from_env("JERSEY_GLYPH_CACHE_MB", DEFAULT_GLYPH_CACHE_MB), lambda entry: image_nbytes(entry[0]))
+
+
+def get_glyph(key: Hashable, render: Callable[[], Tuple[Image.Image, Tuple[int, int]]]) -> Tuple[Image.Image, Tuple[int, int]]:
+    return glyph_cache.get_or_load(key, render)
+
+
+# youth.png resized once per output size (700x1000 blanks, the combo canvas)
+# instead of once per saved file. Entries hold the source overlay too, so a
+# recycled id() can never serve another overlay's resize.
+overlay_cache = LRUCache(DEFAULT_OVERLAY_CACHE_ENTRIES, lambda _entry: 1)
+
+
+def overlay_for_size(overlay: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    size = tuple(size)
+    if overlay.size == size:
+        return overlay
+    key = (id(overlay), size)
+    entry = overlay_cache.get_or_load(key, lambda: (overlay, overlay.resize(size, Image.LANCZOS)))
+    if entry[0] is not overlay:
+        entry = (overlay, overlay.resize(size, Image.LANCZOS))
+        overlay_cache.put(key, entry)
+    return entry[1]
+
+
+def apply_overlay(image: Image.Image, overlay: Optional[Image.Image]) -> Image.Image:
+    """Copy of image with overlay pasted on top, stretched to the image size."""
+    if overlay is None:
+        return image
+    resized = overlay_for_size(overlay, image.size)
+    result = image.copy()
+    result.paste(resized, (0, 0), resized)
+    return result
@@ -0,0 +1,171 @@
+# Border engine - Rally House
+#
+# Solid number/shoulder borders used to be built by pasting an alpha-coloured
+# copy of the image once per (dx, dy) in a (2w+1)^2 square - 100-400 full-image
+# pastes for a typical NumberBorder. The same outline is a square (Chebyshev)
+# dilation of the alpha mask, computed here with a separable max filter: each
+# axis takes O(log w) numpy maximum passes, whatever the border width.
+#
+# Stacked borders (the list form of NumberBorder) share one pass: every ring is
+# a further dilation of the previous one, and the rings are composited outermost
+# first under the original image.
+#
+# Nameplate text outlines work the same way: the outline is the glyph's
+# coverage mask (text_layout.glyph_mask) dilated, instead of the text redrawn
+# at every offset. draw.bitmap() blends exactly like draw.text().
+#
+# Shadow/3d borders stack the mask shifted by (i, i) for i = 1..w. Instead of
+# one layer per step, diagonal_shadow folds the whole stack with shifted
+# maxima/minima (again O(log w) passes): shadow_coverage is the coverage of
+# the stack and shadow_last_step says which step is drawn last - the visible
+# one - at every pixel, so per-step opacities become a lookup. The result is
+# composited as a single layer.
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+Color = Tuple[int, ...]
+
+
+def _sliding_max(values: np.ndarray, window: int) -> np.ndarray:
+    """out[i] = values[i:i + window].max() along axis 1 (output is window - 1 shorter)."""
+    span = 1
+    while span * 2 <= window:
+        values = np.maximum(values[:, :-span], values[:, span:])
+        span *= 2
+    if span < window:
+        # Two overlapping windows of length span cover window exactly.
+        rest = window - span
+        values = np.maximum(values[:, :-rest], values[:, rest:])
+    return values
+
+
+def dilate_mask(mask: np.ndarray, radius: int) -> np.ndarray:
+    """Square max filter of an 8-bit mask; the result grows by radius on every side."""
+    if radius <= 0:
+        return mask
+    height, width = mask.shape
+    pad = 2 * radius
+    padded = np.zeros((height + 2 * pad, width + 2 * pad), dtype=mask.dtype)
+    padded[pad:pad + height, pad:pad + width] = mask
+    window = 2 * radius + 1
+    rows = _sliding_max(padded, window)
+    return np.ascontiguousarray(_sliding_max(rows.T, window).T)
+
+
+def _diagonal_window(values: np.ndarray, window: int, combine, fill) -> np.ndarray:
+    """out[y, x] = combine of values[y - k, x - k] for k in 0..window-1 (fill off the edge)."""
+    span = 1
+    while span < window:
+        shift = min(span, window - span)
+        shifted = np.full_like(values, fill)
+        shifted[shift:, shift:] = values[:-shift, :-shift]
+        values = combine(values, shifted)
+        span += shift
+    return values
+
+
+def _shifted_once(mask: np.ndarray, steps: int) -> np.ndarray:
+    # Step 1 of the stack on a canvas with room for step `steps`.
+    height, width = mask.shape
+    base = np.zeros((height + steps, width + steps), dtype=mask.dtype)
+    base[1:height + 1, 1:width + 1] = mask
+    return base
+
+
+def shadow_coverage(mask: np.ndarray, steps: int) -> np.ndarray:
+    """Max of mask shifted by (i, i) for i = 1..steps, on a canvas steps pixels larger."""
+    return _diagonal_window(_shifted_once(mask, steps), steps, np.maximum, 0)
+
+
+def shadow_last_step(mask: np.ndarray, steps: int) -> np.ndarray:
+    """Per pixel of the shadow_coverage canvas, the largest i whose shift covers it (0: none).
+
+    Drawn in order, that step is the one left on top.
+    """
+    base = _shifted_once(mask, steps)
+    # Along a diagonal the last step to cover a pixel is the first covered row
+    # in its window, so track the smallest covered row index.
+    rows = np.arange(base.shape[0], dtype=np.int32)[:, None]
+    never = np.int32(base.shape[0] + steps)
+    first_row = np.where(base > 0, rows, never)
+    first_row = _diagonal_window(first_row, steps, np.minimum, never)
+    return np.where(first_row < never, rows - first_row + 1, 0)
+
+
+def add_shadow_border(img: Image.Image, color: Color, steps: int) -> Image.Image:
+    """img over its alpha shifted down-right by 1..steps, in color, as one layer.
+
+    The canvas grows by steps + 1 to the right and bottom. Shadow pixels take
+    the image's own alpha, as the per-step pastes this replaces did.
+    """
+    img = img.convert("RGBA") if img.mode != "RGBA" else img
+    coverage = shadow_coverage(np.asarray(img.getchannel("A")), steps)
+    height, width = coverage.shape
+    layer = np.zeros((height + 1, width + 1, 4), dtype=np.uint8)
+    layer[:height, :width, 3] = coverage
+    # Uncovered pixels stay transparent black, as the pasted layers left them.
+    layer[:height, :width, :3][coverage > 0] = color[:3]
+    result = Image.fromarray(layer, "RGBA")
+    result.paste(img, (0, 0), img)
+    return result
+
+
+def add_solid_borders(img: Image.Image, borders: Sequence[Tuple[Color, int]]) -> Image.Image:
+    """Surround img with solid rings, innermost first: borders is [(color, width), ...].
+
+    The canvas grows by the total width on every side; ring colours are drawn
+    fully opaque and the original image is pasted on top, as before.
+    """
+    borders = [(color, width) for color, width in borders if width > 0]
+    if not borders:
+        return img
+    img = img.convert("RGBA") if img.mode != "RGBA" else img
+    total = sum(width for _, width in borders)
+    result = Image.new("RGBA", (img.width + 2 * total, img.height + 2 * total), (0, 0, 0, 0))
+
+    rings: List[Tuple[Color, np.ndarray, int]] = []
+    mask = np.asarray(img.getchannel("A"))
+    offset = total
+    for color, width in borders:
+        mask = dilate_mask(mask, width)
+        offset -= width
+        rings.append((color, mask, offset))
+
+    for color, mask, offset in reversed(rings):
+        layer = Image.new("RGBA", (mask.shape[1], mask.shape[0]), tuple(color[:3]) + (255,))
+        layer.putalpha(Image.fromarray(mask, "L"))
+        result.alpha_composite(layer, (offset, offset))
+    result.paste(img, (total, total), img)
+    return result
+
+
+def dilate_text_mask(mask: Image.Image, origin: Tuple[int, int], radius: int) -> Tuple[Image.Image, Tuple[int, int]]:
+    grown = Image.fromarray(dilate_mask(np.asarray(mask), radius), "L")
+    return grown, (origin[0] - radius, origin[1] - radius)
+
+
+def draw_text_shadow(
+    draw: ImageDraw.ImageDraw,
+    mask: Image.Image,
+    origin: Tuple[int, int],
+    color: Color,
+    opacities: Sequence[int],
+) -> None:
+    """Blend a glyph coverage mask shifted by (i, i) with alpha opacities[i - 1], i = 1..len(opacities).
+
+    One paste in place of drawing the steps one after another; the two agree
+    except where later anti-aliased steps used to wash out earlier ones.
+    """
+    if not opacities:
+        return
+    mask_array = np.asarray(mask)
+    coverage = shadow_coverage(mask_array, len(opacities))
+    last = shadow_last_step(mask_array, len(opacities))
+    alpha_for_step = np.array([0] + list(opacities), dtype=np.uint8)
+    layer = np.empty(coverage.shape + (4,), dtype=np.uint8)
+    layer[..., :3] = np.array(color[:3], dtype=np.uint8)
+    layer[..., 3] = alpha_for_step[last]
+    draw._image.paste(Image.fromarray(layer, "RGBA"), origin, Image.fromarray(coverage, "L"))
@@ -0,0 +1,119 @@
+# Asset compile step - Rally House
+#
+# Bakes pre-downscaled copies (1/2, 1/4, 1/8) of every digit PNG in each team's
+# number folders so the compositors can start from a level close to the target
+# box instead of resampling ~2960 px digits on every row.
+#
+# Usage: python compile_assets.py [--force] [bin_dir ...]
+# Output lives next to the originals: <number folder>/_mips/<factor>/<digit>.png
+# plus <number folder>/_mips/manifest.json keyed by the source file's sha256.
+# A level is only rebuilt when its source PNG changes.
+
+import argparse
+import json
+import os
+from typing import Dict, List
+
+from PIL import Image
+
+import asset_cache
+import curved_generate
+
+
+def iter_number_folders(bin_dirs: List[str]):
+    for bin_dir in bin_dirs:
+        for sport in sorted(os.listdir(bin_dir)):
+            sport_dir = os.path.join(bin_dir, sport)
+            if not os.path.isdir(sport_dir):
+                continue
+            for team in sorted(os.listdir(sport_dir)):
+                team_dir = os.path.join(sport_dir, team)
+                if not os.path.isdir(team_dir):
+                    continue
+                for folder_name in asset_cache.NUMBER_FOLDERS:
+                    number_folder = os.path.join(team_dir, folder_name)
+                    if os.path.isdir(number_folder):
+                        yield number_folder
+
+
+def read_manifest(manifest_path: str) -> Dict[str, Dict]:
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as handle:
+            return json.load(handle).get("files") or {}
+    except (OSError, ValueError):
+        return {}
+
+
+def compile_number_folder(number_folder: str, force: bool = False) -> int:
+    mip_root = os.path.join(number_folder, asset_cache.MIP_DIRNAME)
+    manifest_path = os.path.join(mip_root, asset_cache.MIP_MANIFEST)
+    previous = read_manifest(manifest_path)
+    files: Dict[str, Dict] = {}
+    rebuilt = 0
+
+    for filename in sorted(os.listdir(number_folder)):
+        digit, ext = os.path.splitext(filename)
+        if ext.lower() != ".png" or not digit.isdigit():
+            continue
+        source = os.path.join(number_folder, filename)
+        st = os.stat(source)
+        sha = asset_cache.file_sha256(source)
+        entry = previous.get(filename)
+        outputs_present = all(
+            os.path.exists(asset_cache.mip_path(number_folder, digit, factor)) for factor in asset_cache.MIP_FACTORS
+        )
+        if not force and entry and entry.get("sha256") == sha and outputs_present:
+            entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+            files[filename] = entry
+            continue
+
+        with Image.open(source) as img:
+            full = img.convert("RGBA")
+        levels = {"1": [full.width, full.height]}
+        for factor in asset_cache.MIP_FACTORS:
+            size = (max(1, full.width // factor), max(1, full.height // factor))
+            # Each level is resampled from the full image, not the previous level.
+            level_img = full.resize(size, Image.LANCZOS)
+            out_path = asset_cache.mip_path(number_folder, digit, factor)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            level_img.save(out_path)
+            levels[str(factor)] = list(size)
+        files[filename] = {
+            "sha256": sha,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "levels": levels,
+        }
+        rebuilt += 1
+
+    if files:
+        os.makedirs(mip_root, exist_ok=True)
+        with open(manifest_path, "w", encoding="utf-8") as handle:
+            json.dump({"factors": list(asset_cache.MIP_FACTORS), "files": files}, handle, indent=2)
+    return rebuilt
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compile downscaled digit mip packs for every team folder.")
+    parser.add_argument("bin_dirs", nargs="*", help="Asset roots to scan (defaults to the local and parent bin/ folders).")
+    parser.add_argument("--force", action="store_true", help="Rebuild every level even if the source hash is unchanged.")
+    args = parser.parse_args(argv)
+
+    bin_dirs = args.bin_dirs or curved_generate.get_bin_directories()
+    if not bin_dirs:
+        print("[ERROR] No bin/ directories found. Exiting.")
+        return
+
+    folders = 0
+    rebuilt = 0
+    for number_folder in iter_number_folders(bin_dirs):
+        count = compile_number_folder(number_folder, force=args.force)
+        folders += 1
+        rebuilt += count
+        if count:
+            print(f"Compiled {count} digit(s) in {number_folder}")
+    print(f"Done: {folders} number folder(s) checked, {rebuilt} digit(s) rebuilt.")
+
+
+if __name__ == "__main__":
+    main()
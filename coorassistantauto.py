@@ -3,7 +3,9 @@ import os
 import copy
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+from PIL import Image, ImageTk, ImageDraw
+
+from asset_cache import load_font
 
 
 class CoordsBuilderApp:
@@ -28,7 +30,6 @@ class CoordsBuilderApp:
         self.temp_rect_id = None
         self.start_point = None
         self.listbox_order = []
-        self.font_cache = {}
         self.rotation_scale = None
         self.rotation_value_label = None
         self.rotation_entry = None
@@ -210,7 +211,6 @@ class CoordsBuilderApp:
 
         self.template_path = path
         self.coords_data = data
-        self.font_cache.clear()
         self.element_entries.clear()
         self.element_listbox.delete(0, tk.END)
         self.current_element = None
@@ -332,7 +332,6 @@ class CoordsBuilderApp:
             return
 
         self.coords_data = data
-        self.font_cache.clear()
         self.element_entries.clear()
         self.element_listbox.delete(0, tk.END)
         self.current_element = None
@@ -1140,12 +1139,8 @@ class CoordsBuilderApp:
         raise ValueError("Invalid hex color")
 
     def _get_font(self, font_path, size):
-        key = (font_path, size)
-        if key in self.font_cache:
-            return self.font_cache[key]
-        font = ImageFont.truetype(font_path, size)
-        self.font_cache[key] = font
-        return font
+        # Shared, mtime-aware cache: an edited font file is picked up on reload.
+        return load_font(font_path, size)
 
     def on_include_toggle(self):
         if not self.current_element:
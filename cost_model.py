@@ -0,0 +1,100 @@
+# Job cost model - Rally House
+#
+# Rough relative cost of rendering one order, read off its render plan, so the
+# scheduler can start the expensive jobs first instead of leaving them for the
+# end of a batch. Units are "one plain standard job" = 1.0 (~0.7 s on one core).
+#
+# What actually varies, measured across every team in bin/: the first job that
+# uses a number for a team builds that number's tiles (front/back number and
+# each shoulder box: composite, border, rotate; ~0.3 s a tile, 1.3-2.6 s a
+# job), and every later job with that number pastes them from the tile cache.
+# With tiles cached a job costs about the same whatever its plan - curved
+# 0.73 s vs standard 0.69 s on average, and name length, number border width
+# or ring count, and the youth overlay all stay inside the run-to-run noise,
+# since borders are single numpy passes and fan text is composited into its
+# cropped extent only. So number_tiles_cost does the ranking across jobs and
+# the per-job weights mostly order the rest. The run summary reports how well
+# the estimates ranked the jobs (see rank_correlation) and says when it was weak.
+
+from typing import Dict, Optional, Sequence
+
+from render_plan import RenderPlan
+
+PIPELINE_COST = {"standard": 1.0, "curved": 1.05}
+# Building one number tile on a cache miss.
+NUMBER_TILE_COST = 0.4
+# Per nameplate character: layout + draw; fan glyphs are placed one by one.
+CHAR_COST = {"standard": 0.005, "curved": 0.01}
+# Borders are single numpy passes in border_engine whatever their width: one
+# dilation for solid, one folded offset stack (plus an outline) for shadow/3d.
+SOLID_BORDER_COST = 0.01
+SHADOW_BORDER_COST = 0.02
+YOUTH_COST = 0.02
+# Below this rank correlation the run summary flags the estimates as weak.
+WEAK_RANK_CORRELATION = 0.5
+
+
+def _border_width(config: Optional[Dict]) -> int:
+    if not isinstance(config, dict):
+        return 0
+    try:
+        return max(0, int(round(float(config.get("width", 0) or 0))))
+    except (TypeError, ValueError):
+        return 0
+
+
+def border_cost(config: Optional[Dict], repeats: float = 1.0) -> float:
+    width = _border_width(config)
+    if width == 0:
+        return 0.0
+    if config.get("type", "solid") == "solid":
+        return SOLID_BORDER_COST * repeats
+    return SHADOW_BORDER_COST * repeats
+
+
+def estimate_job_cost(plan: RenderPlan, name_text: str, is_youth: bool) -> float:
+    pipeline = "curved" if plan.use_curved else "standard"
+    chars = len((name_text or "").replace(" ", ""))
+    cost = PIPELINE_COST[pipeline] + CHAR_COST[pipeline] * chars
+    # Nameplate text borders are outlined once per character on the fan layout.
+    cost += border_cost(plan.nameplate_config.get("border"), repeats=max(1, chars) if plan.use_curved else 1)
+    # Number borders apply to front and back numbers; shoulder borders to both shoulders.
+    cost += border_cost(plan.front_number_border) + border_cost(plan.back_number_border)
+    cost += border_cost(plan.front_shoulder_border, 2) + border_cost(plan.back_shoulder_border, 2)
+    if is_youth:
+        cost += YOUTH_COST
+    return cost
+
+
+def number_tiles_cost(plan: RenderPlan) -> float:
+    """Extra cost of the first job that needs a number's tiles for this team."""
+    boxes = [plan.front_number, plan.back_number, *plan.shoulders.values()]
+    return NUMBER_TILE_COST * sum(1 for box in boxes if box is not None)
+
+
+def _ranks(values: Sequence[float]) -> list:
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    ranks = [0.0] * len(values)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2
+        i = j + 1
+    return ranks
+
+
+def rank_correlation(estimates: Sequence[float], actuals: Sequence[float]) -> Optional[float]:
+    """Spearman correlation between estimated costs and measured times."""
+    if len(estimates) < 2:
+        return None
+    x, y = _ranks(estimates), _ranks(actuals)
+    mean_x, mean_y = sum(x) / len(x), sum(y) / len(y)
+    cov = sum((a - mean_x) * (b - mean_y) for a, b in zip(x, y))
+    var_x = sum((a - mean_x) ** 2 for a in x)
+    var_y = sum((b - mean_y) ** 2 for b in y)
+    if var_x == 0 or var_y == 0:
+        return None
+    return cov / (var_x * var_y) ** 0.5
@@ -13,7 +13,36 @@ except Exception:
 	filedialog = None
 
 import pandas as pd
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
+
+import job_tasks
+from asset_cache import (
+	TILE_NUMBERS,
+	apply_overlay,
+	config_key,
+	digit_stamp,
+	file_digest,
+	get_nameplate,
+	get_number_tile,
+	load_digit_images,
+	load_font,
+)
+from border_engine import add_shadow_border, add_solid_borders, draw_text_shadow
+from font_metrics import get_font_metrics, solve_font_size
+from job_log import log
+from raw_store import load_rgba
+from render_plan import BoxSpec, RenderPlan, get_render_plan
+from team_index import get_team_index, normalized
+from text_layout import (
+	arc_angles,
+	circle_cells,
+	composite_glyphs,
+	draw_glyph,
+	fan_cells,
+	glyph_mask,
+	place_glyphs,
+	render_cropped,
+)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CSV_PATH = os.path.join(BASE_DIR, "jerseystocreate.csv")
@@ -107,10 +136,6 @@ def build_order(row: Dict[str, str]) -> JerseyOrder:
 	)
 
 
-def normalized(value: str) -> str:
-	return re.sub(r"[^a-z0-9]", "", (value or "").lower())
-
-
 def candidate_folder_names(team: str, color_list: str) -> List[str]:
 	team = (team or "").strip()
 	color_list = (color_list or "").strip()
@@ -170,24 +195,13 @@ def prompt_csv_via_dialog(initial_dir: Optional[str] = None) -> Optional[str]:
 
 
 def locate_team_folder(order: JerseyOrder) -> str:
-	norm_targets = {normalized(name) for name in candidate_folder_names(order.team, order.color_list)}
+	norm_targets = [normalized(name) for name in candidate_folder_names(order.team, order.color_list)]
 	if not norm_targets:
 		raise FileNotFoundError("No valid team/color combination provided")
 
-	for bin_dir in get_bin_directories():
-		sport_dir = os.path.join(bin_dir, order.sport_specific)
-		if not os.path.isdir(sport_dir):
-			continue
-		for entry in os.listdir(sport_dir):
-			full_path = os.path.join(sport_dir, entry)
-			if not os.path.isdir(full_path):
-				continue
-			entry_norm = normalized(entry)
-			if entry_norm in norm_targets:
-				return full_path
-			# Allow partial matches so long as both strings share prefix
-			if any(entry_norm.startswith(t) or t.startswith(entry_norm) for t in norm_targets):
-				return full_path
+	folder = get_team_index(get_bin_directories()).lookup(order.sport_specific, norm_targets)
+	if folder:
+		return folder
 
 	raise FileNotFoundError(
 		f"Unable to find asset folder for sport '{order.sport_specific}' with team '{order.team}' and colors '{order.color_list}'"
@@ -252,37 +266,26 @@ def apply_text_border(draw, text, position, font, text_color, border_config):
 	border_type = border_config.get("type", "solid")
 	border_color = hex_to_rgba(border_config.get("color", "#000000"))
 	border_width = int(round(border_config["width"]))
-	x, y = position
 
 	if border_type == "solid":
-		for dx in range(-border_width, border_width + 1):
-			for dy in range(-border_width, border_width + 1):
-				if dx != 0 or dy != 0:
-					draw.text((x + dx, y + dy), text, font=font, fill=border_color)
+		if border_width > 0:
+			draw_glyph(draw, text, position, font, border_color, border_width)
 	elif border_type in {"shadow", "3d"}:
+		# The shadow stack and the outline both come from the cached glyph mask
+		mask, (mask_x, mask_y) = glyph_mask(font, text, position)
 		shadow_offset = border_width
 		shadow_color = border_color
+		opacities = []
 		for i in range(1, shadow_offset + 1):
 			distance_factor = (shadow_offset - i + 1) / shadow_offset
 			base_opacity = 0.8
 			opacity = int(255 * base_opacity * distance_factor)
-			opacity = max(80, min(200, opacity))
-			shadow_with_opacity = shadow_color[:3] + (opacity,)
-			draw.text((x + i, y + i), text, font=font, fill=shadow_with_opacity)
+			opacities.append(max(80, min(200, opacity)))
+		draw_text_shadow(draw, mask, (mask_x, mask_y), shadow_color, opacities)
 		if border_width >= 2:
 			outline_opacity = 150
 			outline_color = shadow_color[:3] + (outline_opacity,)
-			for dx, dy in [
-				(-1, -1),
-				(-1, 0),
-				(-1, 1),
-				(0, -1),
-				(0, 1),
-				(1, -1),
-				(1, 0),
-				(1, 1),
-			]:
-				draw.text((x + dx, y + dy), text, font=font, fill=outline_color)
+			draw_glyph(draw, text, position, font, outline_color, 1)
 
 
 def add_image_border_with_type(img, border_color, border_width, border_type="solid"):
@@ -290,52 +293,22 @@ def add_image_border_with_type(img, border_color, border_width, border_type="sol
 		return img
 
 	if border_type == "solid":
-		old_width, old_height = img.size
-		new_width = old_width + (border_width * 2)
-		new_height = old_height + (border_width * 2)
-		result = Image.new("RGBA", (new_width, new_height), (0, 0, 0, 0))
-
-		if img.mode == "RGBA":
-			alpha = img.split()[3]
-			border_layer = Image.new("RGBA", img.size, border_color[:3] + (255,))
-			border_layer.putalpha(alpha)
-			center_x, center_y = border_width, border_width
-			for dx in range(-border_width, border_width + 1):
-				for dy in range(-border_width, border_width + 1):
-					if dx != 0 or dy != 0:
-						distance = max(abs(dx), abs(dy))
-						if distance <= border_width:
-							result.paste(border_layer, (center_x + dx, center_y + dy), border_layer)
-		result.paste(img, (border_width, border_width), img)
-		return result
+		# One alpha dilation instead of a paste per (dx, dy) offset
+		return add_solid_borders(img, [(border_color, border_width)])
 
 	if border_type in {"shadow", "3d"}:
-		shadow_offset = border_width
-		old_width, old_height = img.size
-		new_width = old_width + shadow_offset + 1
-		new_height = old_height + shadow_offset + 1
-		result = Image.new("RGBA", (new_width, new_height), (0, 0, 0, 0))
-
-		if img.mode == "RGBA":
-			alpha = img.split()[3]
-			for i in range(1, shadow_offset + 1):
-				distance_factor = (shadow_offset - i + 1) / shadow_offset
-				base_opacity = 0.5
-				opacity = int(255 * base_opacity * distance_factor)
-				opacity = max(40, min(120, opacity))
-				shadow_layer = Image.new("RGBA", img.size, border_color[:3] + (opacity,))
-				shadow_layer.putalpha(alpha)
-				result.paste(shadow_layer, (i, i), shadow_layer)
-
-		result.paste(img, (0, 0), img)
-		return result
+		# The whole offset stack in one numpy pass
+		return add_shadow_border(img, border_color, border_width)
 
 	return add_image_border_with_type(img, border_color, border_width, "solid")
 
 
 def composite_numbers(number_str, number_folder, target_box, border_settings=None):
 	digits = list(str(number_str))
-	digit_imgs = [Image.open(os.path.join(number_folder, f"{d}.png")).convert("RGBA") for d in digits]
+	x0, y0, x1, y1 = target_box
+	box_width = int(round(x1 - x0))
+	box_height = int(round(y1 - y0))
+	digit_imgs = load_digit_images(number_folder, digits, (box_width, box_height))
 	widths, heights = zip(*(img.size for img in digit_imgs))
 
 	if len(digits) == 1:
@@ -365,50 +338,51 @@ def composite_numbers(number_str, number_folder, target_box, border_settings=Non
 			composite.paste(img, (x, y), img)
 			x += img.size[0]
 
-	x0, y0, x1, y1 = target_box
-	box_width = int(round(x1 - x0))
-	box_height = int(round(y1 - y0))
 	stretched = composite.resize((box_width, box_height), Image.LANCZOS)
 
-	def apply_single_border(img, border_cfg):
+	borders = []
+	for border_cfg in border_settings if isinstance(border_settings, list) else [border_settings]:
 		if border_cfg and border_cfg.get("width", 0) > 0:
 			final_size = min(box_width, box_height)
 			border_width_factor = border_cfg.get("width", 10)
 			proportional_border_width = max(1, int(final_size * border_width_factor / 200))
 			border_color = hex_to_rgba(border_cfg.get("color", "#000000"))
-			border_type = border_cfg.get("type", "solid")
-			img = add_image_border_with_type(img, border_color, proportional_border_width, border_type)
-		return img
+			borders.append((border_cfg.get("type", "solid"), border_color, proportional_border_width))
 
-	if isinstance(border_settings, list):
-		for border_cfg in border_settings:
-			stretched = apply_single_border(stretched, border_cfg)
-	else:
-		stretched = apply_single_border(stretched, border_settings)
-
-	return stretched
+	# Consecutive solid borders are stacked in a single dilation pass.
+	solid_run = []
+	for border_type, border_color, border_width in borders:
+		if border_type == "solid":
+			solid_run.append((border_color, border_width))
+			continue
+		stretched = add_solid_borders(stretched, solid_run)
+		solid_run = []
+		stretched = add_image_border_with_type(stretched, border_color, border_width, border_type)
+	return add_solid_borders(stretched, solid_run)
 
 
 def fit_text_to_box(text, font_path, box_width, box_height, spacing_factor, max_font_size=400, min_font_size=10):
-	best_font = None
-	best_size = None
 	margin = int(box_height * 0.08)
 
-	while min_font_size <= max_font_size:
-		mid = (min_font_size + max_font_size) // 2
-		font = ImageFont.truetype(font_path, mid)
-		char_widths = [font.getbbox(char)[2] - font.getbbox(char)[0] for char in text]
-		spacing = int(mid * spacing_factor)
+	def _measure(size):
+		font = load_font(font_path, size)
+		char_widths = []
+		for char in text:
+			char_bbox = font.getbbox(char)
+			char_widths.append(char_bbox[2] - char_bbox[0])
+		spacing = int(size * spacing_factor)
 		total_width = sum(char_widths) + spacing * (len(text) - 1)
 		bbox = font.getbbox(text)
 		h = bbox[3] - bbox[1]
-		if total_width <= box_width and h <= (box_height - margin):
-			best_font = font
-			best_size = (total_width, h, bbox, spacing, char_widths)
-			min_font_size = mid + 1
-		else:
-			max_font_size = mid - 1
-	return best_font, best_size
+		fits = total_width <= box_width and h <= (box_height - margin)
+		return fits, (font, (total_width, h, bbox, spacing, char_widths))
+
+	# Predict the size from reference metrics; confirm with one or two real fonts.
+	estimate = get_font_metrics(font_path).estimate_size(text, box_width, box_height - margin, spacing_factor)
+	best = solve_font_size(_measure, estimate, min_font_size, max_font_size)
+	if best is None:
+		return None, None
+	return best
 
 
 def render_straight_text(draw, text, font, char_widths, spacing, box_width, box_height, fill_color, border_config):
@@ -421,7 +395,7 @@ def render_straight_text(draw, text, font, char_widths, spacing, box_width, box_
 	for i, char in enumerate(text):
 		if border_config:
 			apply_text_border(draw, char, (x_cursor, y_offset), font, fill_color, border_config)
-		draw.text((x_cursor, y_offset), char, font=font, fill=fill_color)
+		draw_glyph(draw, char, (x_cursor, y_offset), font, fill_color)
 		x_cursor += char_widths[i] + spacing
 
 
@@ -429,22 +403,8 @@ def render_arc_text(draw, text, font, char_widths, spacing, box_width, box_heigh
 	import math as _math
 
 	radius = curve_config.get("radius", 100)
-	angle_degrees = curve_config.get("angle", 60)
 	direction = curve_config.get("direction", "up")
-	angle_radians = _math.radians(angle_degrees)
-	total_width = sum(char_widths) + spacing * (len(text) - 1)
-	arc_length = total_width * 1.2
-	total_char_angle = arc_length / radius
-	start_angle = -total_char_angle / 2
-
-	char_angles = []
-	for i, _char in enumerate(text):
-		if i == 0:
-			char_angle = start_angle
-		else:
-			prev_width = sum(char_widths[:i]) + spacing * i
-			char_angle = start_angle + (prev_width / total_width) * total_char_angle
-		char_angles.append(char_angle)
+	char_angles = arc_angles(char_widths, spacing, radius)
 
 	center_x = box_width // 2
 	if direction == "up":
@@ -459,48 +419,18 @@ def render_arc_text(draw, text, font, char_widths, spacing, box_width, box_heigh
 		char_pos = (int(x - char_widths[i] // 2), int(y))
 		if border_config:
 			apply_text_border(draw, char, char_pos, font, fill_color, border_config)
-		draw.text(char_pos, char, font=font, fill=fill_color)
+		draw_glyph(draw, char, char_pos, font, fill_color)
 
 
 def render_circular_text(draw, text, font, char_widths, spacing, box_width, box_height, fill_color, border_config, curve_config):
-	import math as _math
-
-	radius = curve_config.get("radius", 30)
-	start_angle = curve_config.get("start_angle", 0)
-	total_width = sum(char_widths) + spacing * (len(text) - 1)
-	circumference_portion = total_width / (2 * _math.pi * radius)
-	total_angle = circumference_portion * 360
-	if total_angle > 300:
-		radius = total_width / (2 * _math.pi * (300 / 360))
-		total_angle = 300
-
-	center_x = box_width // 2
-	center_y = box_height // 2
-	current_angle = start_angle - (total_angle / 2)
-
-	for i, char in enumerate(text):
-		char_width = char_widths[i]
-		angle_rad = _math.radians(current_angle)
-		char_x = center_x + radius * _math.cos(angle_rad)
-		char_y = center_y + radius * _math.sin(angle_rad)
-		char_rotation = current_angle + 90
-		char_image = Image.new("RGBA", (char_width + 20, font.size + 20), (0, 0, 0, 0))
-		char_draw = ImageDraw.Draw(char_image)
-		if border_config and border_config.get("width", 0) > 0:
-			border_color = tuple(border_config.get("color", [0, 0, 0]))
-			border_width = border_config.get("width", 1)
-			text_color = fill_color[:3] if len(fill_color) > 3 else fill_color
-			border_color = border_color[:3] if len(border_color) > 3 else border_color
-			add_simple_text_border(char_draw, char, (10, 10), font, text_color, border_color, border_width)
-		else:
-			text_color = fill_color[:3] if len(fill_color) > 3 else fill_color
-			char_draw.text((10, 10), char, font=font, fill=text_color)
-		rotated_char = char_image.rotate(-char_rotation, expand=True)
-		paste_x = int(char_x - rotated_char.width // 2)
-		paste_y = int(char_y - rotated_char.height // 2)
-		draw._image.paste(rotated_char, (paste_x, paste_y), rotated_char)
-		char_angle = (char_width + spacing) / (2 * _math.pi * radius) * 360
-		current_angle += char_angle
+	cells = circle_cells(char_widths, text, font.size, spacing, box_width, box_height, curve_config)
+	text_color = fill_color[:3] if len(fill_color) > 3 else fill_color
+	border_color, border_width = None, 0
+	if border_config and border_config.get("width", 0) > 0:
+		border_color = tuple(border_config.get("color", [0, 0, 0]))
+		border_color = border_color[:3] if len(border_color) > 3 else border_color
+		border_width = int(round(border_config.get("width", 1)))
+	composite_glyphs(draw._image, place_glyphs(font, cells, text_color, border_color, border_width))
 
 
 def render_wave_text(draw, text, font, char_widths, spacing, box_width, box_height, fill_color, border_config, curve_config):
@@ -511,57 +441,39 @@ def render_wave_text(draw, text, font, char_widths, spacing, box_width, box_heig
 	total_width = sum(char_widths) + spacing * (len(text) - 1)
 	start_x = (box_width - total_width) // 2
 	x_cursor = start_x
+	bbox = font.getbbox(text)
+	h = bbox[3] - bbox[1]
+	base_y = (box_height - h) // 2 - bbox[1]
 
 	for i, char in enumerate(text):
 		char_center_x = x_cursor + char_widths[i] / 2
 		normalized_x = (char_center_x - start_x) / total_width if total_width > 0 else 0
 		wave_y = amplitude * _math.sin(2 * _math.pi * frequency * normalized_x)
-		bbox = font.getbbox(text)
-		h = bbox[3] - bbox[1]
-		base_y = (box_height - h) // 2 - bbox[1]
 		y_position = base_y + wave_y
 		char_pos = (int(x_cursor), int(y_position))
 		if border_config:
 			apply_text_border(draw, char, char_pos, font, fill_color, border_config)
-		draw.text(char_pos, char, font=font, fill=fill_color)
+		draw_glyph(draw, char, char_pos, font, fill_color)
 		x_cursor += char_widths[i] + spacing
 
 
-def render_fan_text(draw, text, font, char_widths, spacing, box_width, box_height, fill_color, border_config, curve_config):
-	import math as _math
+def place_fan_glyphs(text, font, char_widths, box_width, box_height, fill_color, border_config, curve_config):
+	cells = fan_cells(char_widths, text, font.size, box_width, box_height, curve_config)
+	text_color = fill_color[:3] if len(fill_color) > 3 else fill_color
+	border_color, border_width = None, 0
+	if border_config and border_config.get("width", 0) > 0:
+		border_color_raw = border_config.get("color", [0, 0, 0])
+		if isinstance(border_color_raw, str):
+			border_color = hex_to_rgba(border_color_raw)[:3]
+		else:
+			border_color = tuple(border_color_raw)[:3]
+		border_width = int(round(border_config.get("width", 1)))
+	return place_glyphs(font, cells, text_color, border_color, border_width)
 
-	total_angle = curve_config.get("angle", 60)
-	radius = curve_config.get("radius", 80)
-	center_x = box_width // 2
-	center_y = min(box_height - 5, box_height * 0.85)
-	angle_step = total_angle / (len(text) - 1) if len(text) > 1 else 0
-	start_angle = -total_angle / 2
 
-	for i, char in enumerate(text):
-		char_width = char_widths[i]
-		current_angle = start_angle + (i * angle_step)
-		angle_rad = _math.radians(current_angle)
-		char_x = center_x + radius * _math.sin(angle_rad)
-		char_y = center_y - radius * _math.cos(angle_rad)
-		padding = 40
-		char_image = Image.new("RGBA", (char_width + padding * 2, font.size + padding * 2), (0, 0, 0, 0))
-		char_draw = ImageDraw.Draw(char_image)
-		if border_config and border_config.get("width", 0) > 0:
-			border_color_raw = border_config.get("color", [0, 0, 0])
-			if isinstance(border_color_raw, str):
-				border_color = hex_to_rgba(border_color_raw)[:3]
-			else:
-				border_color = tuple(border_color_raw)[:3]
-			border_width = border_config.get("width", 1)
-			text_color = fill_color[:3] if len(fill_color) > 3 else fill_color
-			add_simple_text_border(char_draw, char, (padding, padding), font, text_color, border_color, border_width)
-		else:
-			text_color = fill_color[:3] if len(fill_color) > 3 else fill_color
-			char_draw.text((padding, padding), char, font=font, fill=text_color)
-		rotated_char = char_image.rotate(-current_angle, expand=True)
-		paste_x = int(round(char_x - rotated_char.width // 2))
-		paste_y = int(round(char_y - rotated_char.height // 2))
-		draw._image.paste(rotated_char, (paste_x, paste_y), rotated_char)
+def render_fan_text(draw, text, font, char_widths, spacing, box_width, box_height, fill_color, border_config, curve_config):
+	placed = place_fan_glyphs(text, font, char_widths, box_width, box_height, fill_color, border_config, curve_config)
+	composite_glyphs(draw._image, placed)
 
 
 def apply_curve_to_text(draw, text, font, char_widths, spacing, box_width, box_height, fill_color, border_config, curve_config):
@@ -581,13 +493,9 @@ def apply_curve_to_text(draw, text, font, char_widths, spacing, box_width, box_h
 
 
 def add_simple_text_border(draw, text, position, font, text_color, border_color, border_width):
-	x, y = position
-	border_width = int(round(border_width))
-	for dx in range(-border_width, border_width + 1):
-		for dy in range(-border_width, border_width + 1):
-			if dx != 0 or dy != 0:
-				draw.text((x + dx, y + dy), text, font=font, fill=border_color)
-	draw.text(position, text, font=font, fill=text_color)
+	if int(round(border_width)) > 0:
+		draw_glyph(draw, text, position, font, border_color, int(round(border_width)))
+	draw_glyph(draw, text, position, font, text_color)
 
 
 def hex_to_rgba(hex_color):
@@ -601,6 +509,20 @@ def hex_to_rgba(hex_color):
 
 
 def render_nameplate(text, font_path, nameplate_obj, rotation_angle=0, y_offset_extra=0):
+	"""Memoized per (text, font file hash, NamePlate config); see draw_nameplate."""
+	key = (
+		"curved",
+		text,
+		file_digest(font_path),
+		config_key(nameplate_obj),
+		rotation_angle,
+		y_offset_extra,
+		NAMEPLATE_SUPERSAMPLE,
+	)
+	return get_nameplate(key, lambda: draw_nameplate(text, font_path, nameplate_obj, rotation_angle, y_offset_extra))
+
+
+def draw_nameplate(text, font_path, nameplate_obj, rotation_angle=0, y_offset_extra=0):
 	coords = nameplate_obj["coords"]
 	color = nameplate_obj.get("color", "#FFFFFF")
 	border_config = None
@@ -665,31 +587,28 @@ def render_nameplate(text, font_path, nameplate_obj, rotation_angle=0, y_offset_
 		scaled_box_height,
 		spacing_factor,
 	)
-	img = Image.new("RGBA", (render_canvas_width, render_canvas_height), (0, 0, 0, 0))
-	draw = ImageDraw.Draw(img)
 	fill_color = hex_to_rgba(color)
-	apply_curve_to_text(
-		draw,
-		text,
-		font,
-		char_widths,
-		spacing,
-		render_canvas_width,
-		render_canvas_height,
-		fill_color,
-		border_config,
-		curve_config,
-	)
-
 	if curve_type == "fan":
-		bbox = img.getbbox()
-		if bbox:
-			padding = int(20 * render_scale)
-			crop_left = max(0, bbox[0] - padding)
-			crop_top = max(0, bbox[1] - padding)
-			crop_right = min(render_canvas_width, bbox[2] + padding)
-			crop_bottom = min(render_canvas_height, bbox[3] + padding)
-			img = img.crop((crop_left, crop_top, crop_right, crop_bottom))
+		# Only the cropped region around the letters is ever allocated
+		placed = place_fan_glyphs(
+			text, font, char_widths, render_canvas_width, render_canvas_height, fill_color, border_config, curve_config
+		)
+		img = render_cropped(placed, (render_canvas_width, render_canvas_height), int(20 * render_scale))
+	else:
+		img = Image.new("RGBA", (render_canvas_width, render_canvas_height), (0, 0, 0, 0))
+		draw = ImageDraw.Draw(img)
+		apply_curve_to_text(
+			draw,
+			text,
+			font,
+			char_widths,
+			spacing,
+			render_canvas_width,
+			render_canvas_height,
+			fill_color,
+			border_config,
+			curve_config,
+		)
 
 	if render_scale > 1:
 		target_width = max(1, int(round(img.width / render_scale)))
@@ -703,18 +622,65 @@ def render_nameplate(text, font_path, nameplate_obj, rotation_angle=0, y_offset_
 	return img
 
 
-def add_shoulder_number(base_img, number_str, number_folder, shoulder_obj, border_settings=None):
-	if not shoulder_obj or "coords" not in shoulder_obj:
+def number_tile(number_str, number_folder: str, number_box: BoxSpec, border_settings=None) -> Image.Image:
+	"""Bordered FrontNumber/BackNumber image, memoized per box, border and number."""
+	key = (
+		"curved-number",
+		os.path.normpath(number_folder),
+		number_box.coords,
+		config_key(border_settings),
+		str(number_str),
+		digit_stamp(number_folder, number_str),
+	)
+	return get_number_tile(key, lambda: composite_numbers(number_str, number_folder, number_box.coords, border_settings))
+
+
+def shoulder_tile(number_str, number_folder: str, shoulder: BoxSpec, border_settings=None) -> Image.Image:
+	key = (
+		"curved-shoulder",
+		os.path.normpath(number_folder),
+		shoulder.coords,
+		shoulder.rotation,
+		config_key(border_settings),
+		str(number_str),
+		digit_stamp(number_folder, number_str),
+	)
+	return get_number_tile(key, lambda: render_shoulder_number(number_str, number_folder, shoulder, border_settings))
+
+
+def warm_number_tiles(team_folder: str, plan: RenderPlan) -> None:
+	"""Prebuild every number tile for a team so later orders only paste."""
+	plan = RenderPlan.ensure(team_folder, plan)
+	elements = (
+		("number_front", plan.front_number, plan.front_number_border, ("FLShoulder", "FRShoulder"), plan.front_shoulder_border),
+		("number_back", plan.back_number, plan.back_number_border, ("BLShoulder", "BRShoulder"), plan.back_shoulder_border),
+	)
+	for folder_name, number_box, number_border, shoulder_keys, shoulder_border in elements:
+		number_folder = os.path.join(team_folder, folder_name)
+		for number in TILE_NUMBERS:
+			if number_box is not None:
+				number_tile(number, number_folder, number_box, number_border)
+			for key in shoulder_keys:
+				if plan.shoulders[key] is not None:
+					shoulder_tile(number, number_folder, plan.shoulders[key], shoulder_border)
+
+
+def add_shoulder_number(base_img, number_str, number_folder, shoulder: Optional[BoxSpec], border_settings=None):
+	if shoulder is None:
 		return
 
-	coords = shoulder_obj["coords"]
-	rotation = shoulder_obj.get("rotation", 0)
-	x0, y0, x1, y1 = [int(round(c)) for c in coords]
-	box_width = int(round(x1 - x0))
-	box_height = int(round(y1 - y0))
+	rotated_number = shoulder_tile(number_str, number_folder, shoulder, border_settings)
+	x0, y0, *_ = shoulder.box
+	base_img.paste(rotated_number, (x0, y0), rotated_number)
+
+
+def render_shoulder_number(number_str, number_folder, shoulder: BoxSpec, border_settings=None) -> Image.Image:
+	rotation = shoulder.rotation
+	box_width = shoulder.width
+	box_height = shoulder.height
 
 	digits = list(str(number_str))
-	digit_imgs = [Image.open(os.path.join(number_folder, f"{d}.png")).convert("RGBA") for d in digits]
+	digit_imgs = load_digit_images(number_folder, digits, (box_width, box_height))
 	widths, heights = zip(*(img.size for img in digit_imgs))
 
 	if len(digits) == 1:
@@ -750,46 +716,39 @@ def add_shoulder_number(base_img, number_str, number_folder, shoulder_obj, borde
 	final = Image.new("RGBA", (box_width, box_height), (0, 0, 0, 0))
 	offset_x = (box_width - scaled.size[0]) // 2
 	final.paste(scaled, (offset_x, 0), scaled)
-	rotated_number = final.rotate(rotation, expand=True, resample=Image.BICUBIC)
-	base_img.paste(rotated_number, (x0, y0), rotated_number)
+	return final.rotate(rotation, expand=True, resample=Image.BICUBIC)
 
 
 def apply_youth_overlay(image: Image.Image, overlay: Optional[Image.Image]) -> Image.Image:
-	if overlay is None:
-		return image
-	if image.size != overlay.size:
-		overlay_resized = overlay.resize(image.size, Image.LANCZOS)
-	else:
-		overlay_resized = overlay
-	result = image.copy()
-	result.paste(overlay_resized, (0, 0), overlay_resized)
-	return result
+	# Resized overlays are cached per output size in asset_cache
+	return apply_overlay(image, overlay)
 
 
-def create_front_image(order: JerseyOrder, team_folder: str, coords: Dict) -> Image.Image:
+def create_front_image(order: JerseyOrder, team_folder: str, plan: RenderPlan) -> Image.Image:
+	plan = RenderPlan.ensure(team_folder, plan)
 	blanks_folder = os.path.join(team_folder, "blanks")
 	number_folder = os.path.join(team_folder, "number_front")
 	blank_front_path = os.path.join(blanks_folder, "front.png")
 	if not os.path.exists(blank_front_path):
 		raise FileNotFoundError(f"Missing front blank image: {blank_front_path}")
-	blank_img = Image.open(blank_front_path).convert("RGBA")
+	blank_img = load_rgba(blank_front_path)
 	temp = blank_img.copy()
 
-	if "FrontNumber" in coords:
-		front_number_border = coords.get("FrontNumberBorder") or coords.get("NumberBorder")
-		number_img = composite_numbers(order.jersey_number, number_folder, coords["FrontNumber"], front_number_border)
-		x0, y0, *_ = [int(round(c)) for c in coords["FrontNumber"]]
+	if plan.front_number is not None:
+		number_img = number_tile(order.jersey_number, number_folder, plan.front_number, plan.front_number_border)
+		x0, y0, *_ = plan.front_number.box
 		temp.paste(number_img, (x0, y0), number_img)
 
-	add_shoulder_number(temp, order.jersey_number, number_folder, coords.get("FLShoulder"), coords.get("FrontShoulderBorder"))
-	add_shoulder_number(temp, order.jersey_number, number_folder, coords.get("FRShoulder"), coords.get("FrontShoulderBorder"))
+	add_shoulder_number(temp, order.jersey_number, number_folder, plan.shoulders["FLShoulder"], plan.front_shoulder_border)
+	add_shoulder_number(temp, order.jersey_number, number_folder, plan.shoulders["FRShoulder"], plan.front_shoulder_border)
 
 	alpha = blank_img.split()[-1]
 	temp.putalpha(alpha)
 	return temp
 
 
-def create_back_image(order: JerseyOrder, team_folder: str, coords: Dict) -> Image.Image:
+def create_back_image(order: JerseyOrder, team_folder: str, plan: RenderPlan) -> Image.Image:
+	plan = RenderPlan.ensure(team_folder, plan)
 	blanks_folder = os.path.join(team_folder, "blanks")
 	number_folder = os.path.join(team_folder, "number_back")
 	fonts_folder = os.path.join(team_folder, "fonts")
@@ -800,15 +759,14 @@ def create_back_image(order: JerseyOrder, team_folder: str, coords: Dict) -> Ima
 	if not os.path.exists(font_path):
 		raise FileNotFoundError(f"Missing nameplate font: {font_path}")
 
-	blank_img = Image.open(blank_back_path).convert("RGBA")
+	blank_img = load_rgba(blank_back_path)
 	temp = blank_img.copy()
 
-	nameplate_config = coords.get("NamePlate")
-	if not nameplate_config:
+	if plan.nameplate is None:
 		raise KeyError("NamePlate configuration missing from coords")
 
-	rotation_angle = nameplate_config.get("rotation", 0)
-	nameplate_coords = nameplate_config["coords"].copy()
+	rotation_angle = plan.nameplate.rotation
+	nameplate_coords = list(plan.nameplate.coords)
 	if len(order.jersey_name_text) >= 9:
 		nameplate_coords = [
 			nameplate_coords[0],
@@ -817,7 +775,7 @@ def create_back_image(order: JerseyOrder, team_folder: str, coords: Dict) -> Ima
 			nameplate_coords[3] + 20,
 		]
 
-	nameplate_obj = dict(nameplate_config)
+	nameplate_obj = dict(plan.nameplate_config)
 	nameplate_obj["coords"] = nameplate_coords
 	nameplate_img = render_nameplate(order.jersey_name_text.upper(), font_path, nameplate_obj, rotation_angle, 0)
 	x0, y0, x1, y1 = [int(round(c)) for c in nameplate_coords]
@@ -832,15 +790,13 @@ def create_back_image(order: JerseyOrder, team_folder: str, coords: Dict) -> Ima
 		paste_x, paste_y = x0, y0
 	temp.paste(nameplate_img, (paste_x, paste_y), nameplate_img)
 
-	back_number_border = coords.get("BackNumberBorder") or coords.get("NumberBorder")
-	back_number_box = coords.get("BackNumber")
-	if back_number_box:
-		number_img = composite_numbers(order.jersey_number, number_folder, back_number_box, back_number_border)
-		bx0, by0, *_ = [int(round(c)) for c in back_number_box]
+	if plan.back_number is not None:
+		number_img = number_tile(order.jersey_number, number_folder, plan.back_number, plan.back_number_border)
+		bx0, by0, *_ = plan.back_number.box
 		temp.paste(number_img, (bx0, by0), number_img)
 
-	add_shoulder_number(temp, order.jersey_number, number_folder, coords.get("BLShoulder"), coords.get("BackShoulderBorder"))
-	add_shoulder_number(temp, order.jersey_number, number_folder, coords.get("BRShoulder"), coords.get("BackShoulderBorder"))
+	add_shoulder_number(temp, order.jersey_number, number_folder, plan.shoulders["BLShoulder"], plan.back_shoulder_border)
+	add_shoulder_number(temp, order.jersey_number, number_folder, plan.shoulders["BRShoulder"], plan.back_shoulder_border)
 
 	alpha = blank_img.split()[-1]
 	temp.putalpha(alpha)
@@ -895,42 +851,59 @@ def save_image(image: Image.Image, filename: str) -> str:
 	return path
 
 
+def save_overlaid_image(image: Image.Image, overlay: Optional[Image.Image], filename: str) -> str:
+	return save_image(apply_youth_overlay(image, overlay), filename)
+
+
 def process_order(order: JerseyOrder, youth_overlay: Optional[Image.Image]):
 	try:
 		team_folder = locate_team_folder(order)
 	except FileNotFoundError as exc:
-		print(f"✗ {order.name}: {exc}")
+		log(f"✗ {order.name}: {exc}")
 		return
 
 	try:
-		coords = load_coords_json(team_folder)
+		plan = get_render_plan(team_folder)
 	except Exception as exc:
-		print(f"✗ {order.name}: Unable to load coords.json - {exc}")
+		log(f"✗ {order.name}: Unable to load coords.json - {exc}")
 		return
 
+	overlay = youth_overlay if order.is_youth else None
+	front_filename = f"{order.file_stub}-{FRONT_SUFFIX}.png"
+	back_filename = f"{order.file_stub}-{BACK_SUFFIX}.png"
+	combined_filename = f"{order.file_stub}-{COMBINED_SUFFIX}.png"
+
+	# The back renders as a task while this thread renders the front; nothing
+	# is saved until both have rendered, so a failed order leaves no files.
+	# The combo joins them, and the encodes run as tasks too.
+	back_future = job_tasks.submit(create_back_image, order, team_folder, plan)
 	try:
-		front_img = create_front_image(order, team_folder, coords)
-		back_img = create_back_image(order, team_folder, coords)
+		try:
+			front_img = create_front_image(order, team_folder, plan)
+		except Exception:
+			back_error = job_tasks.abandon(back_future)
+			if back_error is not None:
+				log(f"✗ {order.name}: Back render failed too - {back_error}")
+			raise
+		back_img = job_tasks.join(back_future)
 	except Exception as exc:
-		print(f"✗ {order.name}: Error generating jerseys - {exc}")
-		traceback.print_exc()
+		log(f"✗ {order.name}: Error generating jerseys - {exc}")
+		log(traceback.format_exc().rstrip())
 		return
 
-	front_output = apply_youth_overlay(front_img, youth_overlay) if order.is_youth else front_img
-	back_output = apply_youth_overlay(back_img, youth_overlay) if order.is_youth else back_img
-
-	front_filename = f"{order.file_stub}-{FRONT_SUFFIX}.png"
-	back_filename = f"{order.file_stub}-{BACK_SUFFIX}.png"
-	save_image(front_output, front_filename)
-	save_image(back_output, back_filename)
-
-	combined_img = create_combined_image(front_img, back_img)
-	if order.is_youth:
-		combined_img = apply_youth_overlay(combined_img, youth_overlay)
-	combined_filename = f"{order.file_stub}-{COMBINED_SUFFIX}.png"
-	save_image(combined_img, combined_filename)
+	saves = [
+		job_tasks.submit(save_overlaid_image, front_img, overlay, front_filename),
+		job_tasks.submit(save_overlaid_image, back_img, overlay, back_filename),
+	]
+	try:
+		combined_img = create_combined_image(front_img, back_img)
+		save_overlaid_image(combined_img, overlay, combined_filename)
+	finally:
+		job_tasks.wait(saves)
+	for future in saves:
+		future.result()
 
-	print(f"✓ {order.name}: generated {combined_filename}, {back_filename}, {front_filename}")
+	log(f"✓ {order.name}: generated {combined_filename}, {back_filename}, {front_filename}")
 
 
 def read_csv(csv_path: str) -> pd.DataFrame:
@@ -14,12 +14,29 @@
 import os
 import pandas as pd
 import json
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import re
 import shutil
 import numpy as np
 import easygui
 
+from asset_cache import (
+    TILE_NUMBERS,
+    apply_overlay,
+    config_key,
+    digit_stamp,
+    file_digest,
+    get_nameplate,
+    get_number_tile,
+    load_digit_images,
+    load_font,
+)
+from font_metrics import get_font_metrics, solve_font_size
+from job_log import log
+from raw_store import load_rgba
+from render_plan import RenderPlan, get_render_plan
+from text_layout import draw_glyph
+
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CSV_PATH = os.path.join(BASE_DIR, "jerseystocreate.csv")
@@ -33,13 +50,13 @@ def load_coords_json(team_folder):
 
 def composite_numbers(number_str, number_folder, target_box):
     digits = list(str(number_str))
-    digit_imgs = [Image.open(os.path.join(number_folder, f"{d}.png")).convert("RGBA") for d in digits]
-    widths, heights = zip(*(img.size for img in digit_imgs))
-
     x0, y0, x1, y1 = target_box
     box_width = int(round(x1 - x0))
     box_height = int(round(y1 - y0))
 
+    digit_imgs = load_digit_images(number_folder, digits, (box_width, box_height))
+    widths, heights = zip(*(img.size for img in digit_imgs))
+
     # Special case: single digit "1"
     if len(digits) == 1 and digits[0] == '1':
         # Only scale vertically, keep aspect ratio for width, and make 10% smaller
@@ -159,9 +176,8 @@ def composite_numbers(number_str, number_folder, target_box):
         return stretched
 
 def fit_text_to_box(text, font_path, box_width, box_height, spacing_factor, word_spacing_factor=0.33, max_font_size=400, min_font_size=10):
-    # Binary search for best font size to fill the box, with a little margin for descenders
-    best_font = None
-    best_size = None
+    # Largest font size that fills the box, with a little margin for descenders.
+    # The size is predicted from reference-size glyph metrics, then confirmed with real fonts.
     margin = int(box_height * 0.08)  # 8% margin at the bottom
 
     def _advance(font_obj, s):
@@ -171,12 +187,11 @@ def fit_text_to_box(text, font_path, box_width, box_height, spacing_factor, word
         bbox = font_obj.getbbox(s)
         return bbox[2] - bbox[0]
 
-    while min_font_size <= max_font_size:
-        mid = (min_font_size + max_font_size) // 2
-        font = ImageFont.truetype(font_path, mid)
+    def _measure(size):
+        font = load_font(font_path, size)
 
-        spacing = int(mid * spacing_factor)          # letter-to-letter spacing
-        word_spacing = int(mid * word_spacing_factor)  # space between words (single increment)
+        spacing = int(size * spacing_factor)          # letter-to-letter spacing
+        word_spacing = int(size * word_spacing_factor)  # space between words (single increment)
 
         # Measure char advances; treat spaces as 0 here (we add word_spacing separately)
         char_advances = [(_advance(font, ch) if ch != ' ' else 0) for ch in text]
@@ -194,13 +209,16 @@ def fit_text_to_box(text, font_path, box_width, box_height, spacing_factor, word
 
         bbox = font.getbbox(text)
         h = bbox[3] - bbox[1]
-        if total_width <= box_width and h <= (box_height - margin):
-            best_font = font
-            best_size = (total_width, h, bbox, spacing, char_advances, word_spacing)
-            min_font_size = mid + 1
-        else:
-            max_font_size = mid - 1
-    return best_font, best_size
+        fits = total_width <= box_width and h <= (box_height - margin)
+        return fits, (font, (total_width, h, bbox, spacing, char_advances, word_spacing))
+
+    estimate = get_font_metrics(font_path).estimate_size(
+        text, box_width, box_height - margin, spacing_factor, word_spacing_factor
+    )
+    best = solve_font_size(_measure, estimate, min_font_size, max_font_size)
+    if best is None:
+        return None, None
+    return best
 
 def hex_to_rgba(hex_color):
     hex_color = hex_color.lstrip('#')
@@ -269,6 +287,11 @@ def resize_rgba_linear_pm(img, size, resample=Image.LANCZOS):
                                 Image.fromarray(a8, "L")))
 
 def render_nameplate(text, font_path, nameplate_obj, rotation_angle=0, y_offset_extra=0):
+    # Memoized per (text, font file hash, NamePlate config); repeat names skip all glyph work
+    key = ("standard", text, file_digest(font_path), config_key(nameplate_obj), rotation_angle, y_offset_extra)
+    return get_nameplate(key, lambda: draw_nameplate(text, font_path, nameplate_obj, rotation_angle, y_offset_extra))
+
+def draw_nameplate(text, font_path, nameplate_obj, rotation_angle=0, y_offset_extra=0):
     coords = nameplate_obj["coords"]
     color = nameplate_obj.get("color", "#FFFFFF")
     spacing_factor = nameplate_obj.get("spacing_factor", 0.06)  # Default to 0.06 if not present
@@ -301,7 +324,7 @@ def render_nameplate(text, font_path, nameplate_obj, rotation_angle=0, y_offset_
             x_cursor += word_spacing  # single increment; no letter-spacing around spaces
             continue
 
-        draw.text((x_cursor, y_offset), char, font=font, fill=fill_color)
+        draw_glyph(draw, char, (x_cursor, y_offset), font, fill_color)
         x_cursor += char_widths[i]
         if i < len(text) - 1 and text[i + 1] != ' ':
             x_cursor += spacing
@@ -321,34 +344,27 @@ def render_nameplate(text, font_path, nameplate_obj, rotation_angle=0, y_offset_
             img = img.crop(bbox_img)
     return img
 
-def process_front(row, team_folder, coords):
+def render_front(row, team_folder, plan):
+    plan = RenderPlan.ensure(team_folder, plan)
     player_name, player_number = extract_name_and_number(row["Jersey Characters"])
     blanks_folder = os.path.join(team_folder, "blanks")
     number_folder = os.path.join(team_folder, "number_front")
     blank_front_path = os.path.join(blanks_folder, "front.png")
-    blank_img = Image.open(blank_front_path).convert("RGBA")
-
-    # --- Handle both dict and list formats for FrontNumber ---
-    front_number_obj = coords["FrontNumber"]
-    if isinstance(front_number_obj, dict):
-        front_number_coords = front_number_obj["coords"]
-        front_number_rotation = front_number_obj.get("rotation", coords.get("NamePlate", {}).get("rotation", 0))
-    else:
-        front_number_coords = front_number_obj
-        front_number_rotation = coords.get("NamePlate", {}).get("rotation", 0)
+    blank_img = load_rgba(blank_front_path)
 
-    number_img = composite_numbers(player_number, number_folder, front_number_coords)
+    # FrontNumber list/dict forms and the NamePlate rotation fallback are resolved in the plan
+    front_number = plan.front_number
+    if front_number is None:
+        raise KeyError("FrontNumber")
+    front_number_rotation = front_number.rotation
 
-    if front_number_rotation != 0:
-        number_img = number_img.rotate(front_number_rotation, expand=True, resample=Image.BICUBIC, fillcolor=(0,0,0,0))
-    x0, y0, x1, y1 = [int(round(c)) for c in front_number_coords]
+    number_img = number_tile(player_number, number_folder, front_number)
+    x0, y0, x1, y1 = front_number.box
     # Center if rotated
     if front_number_rotation != 0:
         num_w, num_h = number_img.size
-        box_w = int(round(x1 - x0))
-        box_h = int(round(y1 - y0))
-        paste_x = x0 + (box_w - num_w) // 2
-        paste_y = y0 + (box_h - num_h) // 2
+        paste_x = x0 + (front_number.width - num_w) // 2
+        paste_y = y0 + (front_number.height - num_h) // 2
     else:
         paste_x, paste_y = x0, y0
 
@@ -362,60 +378,56 @@ def process_front(row, team_folder, coords):
     temp = blank_img.copy()
     temp.paste(number_img, (paste_x, paste_y), number_img)
     # Add front shoulder numbers
-    add_shoulder_number(temp, player_number, number_folder, coords["FLShoulder"])
-    add_shoulder_number(temp, player_number, number_folder, coords["FRShoulder"])
+    add_shoulder_number(temp, player_number, number_folder, plan.shoulders["FLShoulder"])
+    add_shoulder_number(temp, player_number, number_folder, plan.shoulders["FRShoulder"])
     alpha = blank_img.split()[-1]
     temp.putalpha(alpha)
-    out_name = f"{row['Name']}-3.png"
-    out_path = os.path.join(OUTPUT_DIR, out_name)
-    temp.save(out_path)
-    print(f"Saved {out_path}")
+    return temp
 
-def process_back(row, team_folder, coords):
+def process_front(row, team_folder, plan, overlay=None):
+    temp = render_front(row, team_folder, plan)
+    save_output(temp, f"{row['Name']}-3.png", overlay)
+    return temp
+
+def render_back(row, team_folder, plan):
+    plan = RenderPlan.ensure(team_folder, plan)
     player_name, player_number = extract_name_and_number(row["Jersey Characters"])
     blanks_folder = os.path.join(team_folder, "blanks")
     number_folder = os.path.join(team_folder, "number_back")
     fonts_folder = os.path.join(team_folder, "fonts")
     font_path = os.path.join(fonts_folder, "NamePlate.otf")
     blank_back_path = os.path.join(blanks_folder, "back.png")
-    blank_img = Image.open(blank_back_path).convert("RGBA")
+    blank_img = load_rgba(blank_back_path)
 
     # Respect coords.json exactly (no Y shifting for long names)
-    rotation_angle = coords.get("NamePlate", {}).get("rotation", 0)
-    nameplate_obj = dict(coords["NamePlate"])  # do not modify coords
-    nameplate_img = render_nameplate(player_name.upper(), font_path, nameplate_obj, rotation_angle, 0)
+    nameplate = plan.nameplate
+    if nameplate is None:
+        raise KeyError("NamePlate")
+    nameplate_obj = dict(plan.nameplate_config)  # do not modify the shared plan
+    nameplate_img = render_nameplate(player_name.upper(), font_path, nameplate_obj, nameplate.rotation, 0)
 
-    x0, y0, x1, y1 = [int(round(c)) for c in coords["NamePlate"]["coords"]]
-    box_width = int(round(x1 - x0))
-    box_height = int(round(y1 - y0))
+    x0, y0, x1, y1 = nameplate.box
 
     # Top-align inside the box; center horizontally regardless of rotation
     np_w, np_h = nameplate_img.size
-    paste_x = x0 + (box_width - np_w) // 2
+    paste_x = x0 + (nameplate.width - np_w) // 2
     paste_y = y0  # top aligned to the box
 
     temp = blank_img.copy()
     temp.paste(nameplate_img, (paste_x, paste_y), nameplate_img)
 
-    # --- Handle both dict and list formats for BackNumber ---
-    back_number_obj = coords["BackNumber"]
-    if isinstance(back_number_obj, dict):
-        back_number_coords = back_number_obj["coords"]
-        back_number_rotation = back_number_obj.get("rotation", coords.get("NamePlate", {}).get("rotation", 0))
-    else:
-        back_number_coords = back_number_obj
-        back_number_rotation = coords.get("NamePlate", {}).get("rotation", 0)
+    # BackNumber list/dict forms and the NamePlate rotation fallback are resolved in the plan
+    back_number = plan.back_number
+    if back_number is None:
+        raise KeyError("BackNumber")
+    back_number_rotation = back_number.rotation
 
-    number_img = composite_numbers(player_number, number_folder, back_number_coords)
-    if back_number_rotation != 0:
-        number_img = number_img.rotate(back_number_rotation, expand=True, resample=Image.BICUBIC, fillcolor=(0,0,0,0))
-    x0, y0, x1, y1 = [int(round(c)) for c in back_number_coords]
+    number_img = number_tile(player_number, number_folder, back_number)
+    x0, y0, x1, y1 = back_number.box
     if back_number_rotation != 0:
         num_w, num_h = number_img.size
-        box_w = int(round(x1 - x0))
-        box_h = int(round(y1 - y0))
-        paste_x_num = x0 + (box_w - num_w) // 2
-        paste_y_num = y0 + (box_h - num_h) // 2
+        paste_x_num = x0 + (back_number.width - num_w) // 2
+        paste_y_num = y0 + (back_number.height - num_h) // 2
     else:
         paste_x_num, paste_y_num = x0, y0
 
@@ -426,25 +438,89 @@ def process_back(row, team_folder, coords):
         paste_x_num -= 0
 
     temp.paste(number_img, (paste_x_num, paste_y_num), number_img)
-    add_shoulder_number(temp, player_number, number_folder, coords["BLShoulder"])
-    add_shoulder_number(temp, player_number, number_folder, coords["BRShoulder"])
+    add_shoulder_number(temp, player_number, number_folder, plan.shoulders["BLShoulder"])
+    add_shoulder_number(temp, player_number, number_folder, plan.shoulders["BRShoulder"])
     alpha = blank_img.split()[-1]
     temp.putalpha(alpha)
-    out_name = f"{row['Name']}-2.png"
+    return temp
+
+def process_back(row, team_folder, plan, overlay=None):
+    temp = render_back(row, team_folder, plan)
+    save_output(temp, f"{row['Name']}-2.png", overlay)
+    return temp
+
+def save_output(img, out_name, overlay=None, icc=None):
+    # Youth overlay goes on the saved copy; the combo is built from the plain images
     out_path = os.path.join(OUTPUT_DIR, out_name)
-    temp.save(out_path)
-    print(f"Saved {out_path}")
+    img = apply_overlay(img, overlay)
+    if icc:
+        img.save(out_path, icc_profile=icc)
+    else:
+        img.save(out_path)
+    log(f"Saved {out_path}")
+    return out_path
+
+def number_tile(number_str, number_folder, number_box):
+    # Composited and rotated FrontNumber/BackNumber image, memoized per box and number
+    key = (
+        "standard-number",
+        os.path.normpath(number_folder),
+        number_box.coords,
+        number_box.rotation,
+        str(number_str),
+        digit_stamp(number_folder, number_str),
+    )
 
-def add_shoulder_number(base_img, number_str, number_folder, shoulder_obj):
-    coords = shoulder_obj["coords"]
-    rotation = shoulder_obj.get("rotation", 0)
-    x0, y0, x1, y1 = [int(round(c)) for c in coords]
-    box_width = int(round(x1 - x0))
-    box_height = int(round(y1 - y0))
+    def _render():
+        img = composite_numbers(number_str, number_folder, number_box.coords)
+        if number_box.rotation != 0:
+            img = img.rotate(number_box.rotation, expand=True, resample=Image.BICUBIC, fillcolor=(0,0,0,0))
+        return img
+
+    return get_number_tile(key, _render)
+
+def shoulder_tile(number_str, number_folder, shoulder):
+    key = (
+        "standard-shoulder",
+        os.path.normpath(number_folder),
+        shoulder.coords,
+        shoulder.rotation,
+        str(number_str),
+        digit_stamp(number_folder, number_str),
+    )
+    return get_number_tile(key, lambda: render_shoulder_number(number_str, number_folder, shoulder))
+
+def warm_number_tiles(team_folder, plan):
+    # Prebuild every number tile for a team so later rows only paste
+    plan = RenderPlan.ensure(team_folder, plan)
+    elements = (
+        ("number_front", plan.front_number, (plan.shoulders["FLShoulder"], plan.shoulders["FRShoulder"])),
+        ("number_back", plan.back_number, (plan.shoulders["BLShoulder"], plan.shoulders["BRShoulder"])),
+    )
+    for folder_name, number_box, shoulders in elements:
+        number_folder = os.path.join(team_folder, folder_name)
+        for number in TILE_NUMBERS:
+            if number_box is not None:
+                number_tile(number, number_folder, number_box)
+            for shoulder in shoulders:
+                if shoulder is not None:
+                    shoulder_tile(number, number_folder, shoulder)
+
+def add_shoulder_number(base_img, number_str, number_folder, shoulder):
+    if shoulder is None:
+        return
+    rotated_number = shoulder_tile(number_str, number_folder, shoulder)
+    # Paste the rotated number at the top-left of the bounding box
+    x0, y0, x1, y1 = shoulder.box
+    base_img.paste(rotated_number, (x0, y0), rotated_number)
 
+def render_shoulder_number(number_str, number_folder, shoulder):
+    rotation = shoulder.rotation
+    box_width = shoulder.width
+    box_height = shoulder.height
     # Prepare digit images
     digits = list(str(number_str))
-    digit_imgs = [Image.open(os.path.join(number_folder, f"{d}.png")).convert("RGBA") for d in digits]
+    digit_imgs = load_digit_images(number_folder, digits, (box_width, box_height))
     widths, heights = zip(*(img.size for img in digit_imgs))
 
     # For single digit, treat as if it's two digits for scaling, but only render one
@@ -485,18 +561,17 @@ def add_shoulder_number(base_img, number_str, number_folder, shoulder_obj):
     final.paste(scaled, (offset_x, 0), scaled)
 
     # Rotate the number image
-    rotated_number = final.rotate(rotation, expand=True, resample=Image.BICUBIC, fillcolor=(0,0,0,0))
-    # Paste the rotated number at the top-left of the bounding box
-    base_img.paste(rotated_number, (x0, y0), rotated_number)
+    return final.rotate(rotation, expand=True, resample=Image.BICUBIC, fillcolor=(0,0,0,0))
+
+def _as_rgba(img_or_path):
+    if isinstance(img_or_path, Image.Image):
+        return img_or_path if img_or_path.mode == "RGBA" else img_or_path.convert("RGBA")
+    return Image.open(img_or_path).convert("RGBA")
 
-def process_combo(row, front_path, back_path):
+def render_combo(front_img, back_img):
     combo_width, combo_height = 700, 1000
     scale = 0.68
 
-    # Load images
-    front_img = Image.open(front_path).convert("RGBA")
-    back_img = Image.open(back_path).convert("RGBA")
-
     # Scale images (linear-light premultiplied alpha)
     front_scaled = resize_rgba_linear_pm(
         front_img, (int(front_img.width * scale), int(front_img.height * scale)), Image.LANCZOS
@@ -515,16 +590,18 @@ def process_combo(row, front_path, back_path):
     front_x = int(combo_width * 0.30) + 13
     front_y = int(combo_height * 0.18) + 70
     combo_img.paste(front_scaled, (front_x, front_y), front_scaled)
+    return combo_img
+
+def combo_icc(front_img, back_img):
+    return front_img.info.get("icc_profile") or back_img.info.get("icc_profile")
 
+def process_combo(row, front_img, back_img, overlay=None):
+    # Takes the images returned by process_front/process_back (file paths still work)
+    front_img = _as_rgba(front_img)
+    back_img = _as_rgba(back_img)
+    combo_img = render_combo(front_img, back_img)
     # Save combo image (preserve ICC if available)
-    icc = front_img.info.get("icc_profile") or back_img.info.get("icc_profile")
-    out_name = f"{row['Name']}-1.png"
-    out_path = os.path.join(OUTPUT_DIR, out_name)
-    if icc:
-        combo_img.save(out_path, icc_profile=icc)
-    else:
-        combo_img.save(out_path)
-    print(f"Saved {out_path}")
+    save_output(combo_img, f"{row['Name']}-1.png", overlay, combo_icc(front_img, back_img))
 
 def apply_overlay_to_file(result_path, overlay_img):
     try:
@@ -532,19 +609,15 @@ def apply_overlay_to_file(result_path, overlay_img):
         icc = base_pil.info.get("icc_profile")
         base = base_pil.convert("RGBA")
 
-        ov = overlay_img
-        if ov.size != base.size:
-            ov = ov.resize(base.size, Image.LANCZOS)
-
         # Overlay on top
-        base.paste(ov, (0, 0), ov)
+        base = apply_overlay(base, overlay_img)
 
         if icc:
             base.save(result_path, icc_profile=icc)
         else:
             base.save(result_path)
     except Exception as e:
-        print(f"[WARN] Failed to overlay youth.png on {result_path}: {e}")
+        log(f"[WARN] Failed to overlay youth.png on {result_path}: {e}")
 
 def extract_last_name_and_suffix(full_name):
     # Remove nicknames in quotes
@@ -670,14 +743,8 @@ def main():
             print(f"[WARN] Assets not found for '{team_folder_name}' in {sport_folder}. Skipping.")
             continue
 
-        coords = load_coords_json(team_folder)
-        process_front(row, team_folder, coords)
-        process_back(row, team_folder, coords)
-        front_path = os.path.join(OUTPUT_DIR, f"{row['Name']}-3.png")
-        back_path = os.path.join(OUTPUT_DIR, f"{row['Name']}-2.png")
-        process_combo(row, front_path, back_path)
-
-        # Youth overlay on all three outputs if needed
+        # Youth overlay on all three outputs if needed, applied before the single save
+        overlay = None
         is_youth = str(row.get("Mens or Youth", "")).strip().lower() == "youth"
         if is_youth:
             if youth_overlay_img is None:
@@ -686,13 +753,12 @@ def main():
                 else:
                     print(f"[WARN] youth.png not found at {youth_overlay_path}. Skipping youth overlay.")
                     youth_overlay_img = False  # mark as unavailable
+            overlay = youth_overlay_img or None
 
-            if youth_overlay_img:
-                combo_path = os.path.join(OUTPUT_DIR, f"{row['Name']}-1.png")
-                # Overlay on top of each result image
-                apply_overlay_to_file(front_path, youth_overlay_img)
-                apply_overlay_to_file(back_path, youth_overlay_img)
-                apply_overlay_to_file(combo_path, youth_overlay_img)
+        plan = get_render_plan(team_folder)
+        front_img = process_front(row, team_folder, plan, overlay)
+        back_img = process_back(row, team_folder, plan, overlay)
+        process_combo(row, front_img, back_img, overlay)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
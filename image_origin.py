@@ -0,0 +1,401 @@
+# On-demand jersey image origin - Rally House
+#
+# Renders jersey images the first time a product page asks for them:
+#
+#   GET /{sport}/{team-color}/{name}/{number}/{view}.png[?youth=1]
+#   view = front | back | combo
+#
+# e.g. /Football/NCAA-KAN JAYHAWKS-ROYAL/JOHNSON/1/combo.png (URL-encoded).
+#
+# Finished PNGs live in a content-addressed disk cache: objects/<sha256>.png
+# holds the bytes and refs/<request key> points at the object. The request key
+# hashes the URL fields together with the team's asset fingerprint (coords.json,
+# blanks, font and digit file mtimes, plus youth.png for youth requests), so
+# editing a team's assets naturally renders fresh images on the next request;
+# the in-memory render caches are dropped first so the new render cannot reuse
+# pixels from the old files. The object hash is the strong ETag;
+# If-None-Match gets a 304. Identical requests arriving while a render is in
+# flight wait for that render instead of starting their own.
+#
+#   python image_origin.py [--host 127.0.0.1] [--port 8766] [--cache-dir DIR]
+
+import argparse
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import curved_generate as curved_generator
+import generate as standard_generator
+import jersey_generator
+from asset_cache import (
+    digit_cache,
+    file_digest,
+    font_cache,
+    glyph_cache,
+    nameplate_cache,
+    number_tile_cache,
+    overlay_cache,
+)
+from render_plan import RenderPlan, get_render_plan
+from team_index import get_team_index, normalized, reset_team_index
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, "origin_cache")
+DEFAULT_PORT = 8766
+VIEWS = ("front", "back", "combo")
+# Bump when rendering changes in a way the asset fingerprint cannot see.
+RENDER_VERSION = 1
+CACHE_CONTROL = "public, max-age=3600"
+
+
+class OriginError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ImageRequest:
+    __slots__ = ("sport", "team_color", "name", "number", "view", "youth")
+
+    def __init__(self, sport: str, team_color: str, name: str, number: str, view: str, youth: bool):
+        self.sport = sport
+        self.team_color = team_color
+        self.name = name
+        self.number = number
+        self.view = view
+        self.youth = youth
+
+    @classmethod
+    def from_url(cls, url: str) -> "ImageRequest":
+        parts = urlsplit(url)
+        segments = [unquote(segment) for segment in parts.path.strip("/").split("/")]
+        if len(segments) != 5 or not segments[4].lower().endswith(".png"):
+            raise OriginError(404, "Expected /{sport}/{team-color}/{name}/{number}/{view}.png")
+        sport, team_color, name, number, view_file = segments
+        view = view_file[:-4].lower()
+        if view not in VIEWS:
+            raise OriginError(404, f"Unknown view '{view}' (use {', '.join(VIEWS)})")
+        name = " ".join(name.split()).upper()
+        if not name:
+            raise OriginError(400, "Missing player name")
+        if not number.isdigit() or len(number) > 2:
+            raise OriginError(400, f"Jersey number must be 1-2 digits, got '{number}'")
+        youth = parse_qs(parts.query).get("youth", ["0"])[0].lower() in {"1", "true", "yes"}
+        return cls(sport, team_color, name, number, view, youth)
+
+    def with_view(self, view: str) -> "ImageRequest":
+        return ImageRequest(self.sport, self.team_color, self.name, self.number, view, self.youth)
+
+
+def youth_overlay_path() -> Optional[str]:
+    """The youth.png load_youth_overlay would pick, or None if there is none."""
+    candidates = [os.path.join(bin_dir, "youth.png") for bin_dir in curved_generator.get_bin_directories()]
+    candidates.append(os.path.join(jersey_generator.ASSETS_ROOT, "youth.png"))
+    return next((path for path in candidates if os.path.exists(path)), None)
+
+
+def _mtime_ns(path: Optional[str]) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except OSError:
+        return None
+
+
+def asset_versions(team_folder: str, plan: RenderPlan, number: str, youth: bool) -> List[Tuple[str, object]]:
+    """(path, version) of everything on disk a render of this number depends on."""
+    paths = [
+        os.path.join(team_folder, "blanks", "front.png"),
+        os.path.join(team_folder, "blanks", "back.png"),
+    ]
+    for folder in ("number_front", "number_back", "number_shoulder"):
+        paths.extend(os.path.join(team_folder, folder, f"{digit}.png") for digit in sorted(set(number)))
+    versions: List[Tuple[str, object]] = [(os.path.join(team_folder, "coords.json"), plan.mtime_ns)]
+    versions.extend((path, _mtime_ns(path)) for path in paths)
+    font_path = os.path.join(team_folder, "fonts", "NamePlate.otf")
+    versions.append((font_path, file_digest(font_path) if os.path.exists(font_path) else None))
+    if youth:
+        overlay_path = youth_overlay_path()
+        versions.append(("youth.png", [overlay_path, _mtime_ns(overlay_path)]))
+    return versions
+
+
+def asset_fingerprint(team_folder: str, plan: RenderPlan, number: str, youth: bool = False) -> List:
+    """Versions of everything on disk a render of this number depends on."""
+    return [version for _path, version in asset_versions(team_folder, plan, number, youth)]
+
+
+class ImageOrigin:
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.refs_dir = os.path.join(cache_dir, "refs")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.refs_dir, exist_ok=True)
+        self._youth_lock = threading.Lock()
+        self._youth_version = [youth_overlay_path(), _mtime_ns(youth_overlay_path())]
+        self.youth_overlay = jersey_generator.load_youth_overlay()
+        # Last version seen of each asset file; see forget_stale_assets.
+        self._asset_versions: Dict[str, object] = {}
+        self._asset_lock = threading.Lock()
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    def resolve_team(self, request: ImageRequest) -> Tuple[str, RenderPlan]:
+        bin_dirs = curved_generator.get_bin_directories()
+        targets = [normalized(request.team_color)]
+        index = get_team_index(bin_dirs)
+        team_folder = index.lookup(request.sport, targets)
+        if (not team_folder or not os.path.isdir(team_folder)) and not index.is_current():
+            # Team folders added or renamed since startup: rescan, as the render daemon does.
+            reset_team_index()
+            team_folder = get_team_index(bin_dirs).lookup(request.sport, targets)
+        if not team_folder:
+            raise OriginError(404, f"No assets for '{request.team_color}' in '{request.sport}'")
+        return team_folder, get_render_plan(team_folder)
+
+    def request_key(self, request: ImageRequest, team_folder: str, plan: RenderPlan) -> str:
+        fields = [
+            RENDER_VERSION,
+            os.path.basename(team_folder),
+            request.sport,
+            request.name,
+            request.number,
+            request.view,
+            request.youth,
+            asset_fingerprint(team_folder, plan, request.number, request.youth),
+        ]
+        return hashlib.sha256(json.dumps(fields).encode("utf-8")).hexdigest()
+
+    def current_youth_overlay(self):
+        """The youth overlay, reloaded if youth.png was replaced or edited since it was loaded."""
+        version = [youth_overlay_path(), _mtime_ns(youth_overlay_path())]
+        with self._youth_lock:
+            if version != self._youth_version:
+                self.youth_overlay = jersey_generator.load_youth_overlay()
+                self._youth_version = version
+            return self.youth_overlay
+
+    def forget_stale_assets(self, request: ImageRequest, team_folder: str, plan: RenderPlan) -> None:
+        """Drop in-memory render caches once any asset this request uses has changed on disk.
+
+        The digit, tile, nameplate and glyph caches are shared by every team and
+        outlive an asset edit. A new fingerprint means a new request key, so a
+        render built from stale entries would be stored - and served - under it
+        for good. Clearing them all is blunt but rare: it only happens when a
+        file we have already rendered from changes.
+        """
+        changed = False
+        with self._asset_lock:
+            for path, version in asset_versions(team_folder, plan, request.number, request.youth):
+                previous = self._asset_versions.get(path, version)
+                changed = changed or previous != version
+                self._asset_versions[path] = version
+        if changed:
+            for cache in (digit_cache, number_tile_cache, nameplate_cache, glyph_cache, font_cache, overlay_cache):
+                cache.clear()
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self.refs_dir, key)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, f"{digest}.png")
+
+    def lookup(self, key: str) -> Optional[str]:
+        try:
+            with open(self._ref_path(key), "r", encoding="utf-8") as handle:
+                digest = handle.read().strip()
+        except OSError:
+            return None
+        return digest if os.path.exists(self._object_path(digest)) else None
+
+    def store(self, key: str, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            _atomic_write(object_path, data)
+        _atomic_write(self._ref_path(key), digest.encode("ascii"))
+        return digest
+
+    def read_object(self, digest: str) -> bytes:
+        with open(self._object_path(digest), "rb") as handle:
+            return handle.read()
+
+    def get(self, request: ImageRequest) -> str:
+        """Object digest for request, rendering (once, however many callers) on a miss."""
+        team_folder, plan = self.resolve_team(request)
+        key = self.request_key(request, team_folder, plan)
+        digest = self.lookup(key)
+        if digest:
+            return digest
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            digest = self.lookup(key)
+            if not digest:
+                self.forget_stale_assets(request, team_folder, plan)
+                digest = self.store(key, self.render(request, team_folder, plan))
+            future.set_result(digest)
+            return digest
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def render(self, request: ImageRequest, team_folder: str, plan: RenderPlan) -> bytes:
+        overlay = self.current_youth_overlay() if request.youth else None
+        if request.view == "combo":
+            # The combo needs both sides; cache them too since pages usually show all three.
+            sides = {}
+            for view in ("front", "back"):
+                side_request = request.with_view(view)
+                side_img, side_icc = self._render_side(side_request, team_folder, plan)
+                sides[view] = side_img
+                side_key = self.request_key(side_request, team_folder, plan)
+                if not self.lookup(side_key):
+                    self.store(side_key, _encode_png(curved_generator.apply_youth_overlay(side_img, overlay), side_icc))
+            front_img, back_img = sides["front"], sides["back"]
+            if plan.use_curved:
+                combo = curved_generator.create_combined_image(front_img, back_img)
+                icc = None
+            else:
+                combo = standard_generator.render_combo(front_img, back_img)
+                icc = standard_generator.combo_icc(front_img, back_img)
+            return _encode_png(curved_generator.apply_youth_overlay(combo, overlay), icc)
+
+        image, icc = self._render_side(request, team_folder, plan)
+        return _encode_png(curved_generator.apply_youth_overlay(image, overlay), icc)
+
+    def _render_side(self, request: ImageRequest, team_folder: str, plan: RenderPlan):
+        # Same engine choice as the batch generator, so URLs match batch output.
+        jersey_characters = f"{request.name} {request.number}"
+        if plan.use_curved:
+            order = curved_generator.JerseyOrder(
+                name=f"{request.name}-{request.number}",
+                jersey_style_number="",
+                team=request.team_color,
+                color_list="",
+                jersey_characters=jersey_characters,
+                player_name=request.name,
+                garment_group="Youth" if request.youth else "",
+                sport_specific=request.sport,
+                jersey_name_text=request.name,
+                jersey_number=request.number,
+            )
+            create = curved_generator.create_front_image if request.view == "front" else curved_generator.create_back_image
+            image = create(order, team_folder, plan)
+        else:
+            row = {"Name": f"{request.name}-{request.number}", "Jersey Characters": jersey_characters}
+            render = standard_generator.render_front if request.view == "front" else standard_generator.render_back
+            image = render(row, team_folder, plan)
+        return image, image.info.get("icc_profile")
+
+
+def _encode_png(image, icc: Optional[bytes]) -> bytes:
+    buffer = io.BytesIO()
+    if icc:
+        image.save(buffer, "PNG", icc_profile=icc)
+    else:
+        image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(data)
+    os.replace(tmp_path, path)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    origin: ImageOrigin = None  # set by serve()
+
+    def _error(self, status: int, message: str) -> None:
+        data = message.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def do_GET(self):
+        try:
+            request = ImageRequest.from_url(self.path)
+            digest = self.origin.get(request)
+        except OriginError as exc:
+            self._error(exc.status, str(exc))
+            return
+        except Exception as exc:
+            self._error(500, f"Render failed: {exc}")
+            return
+
+        etag = f'"{digest}"'
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", CACHE_CONTROL)
+            self.end_headers()
+            return
+
+        data = self.origin.read_object(digest)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", CACHE_CONTROL)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    do_HEAD = do_GET
+
+    def log_message(self, format, *args):
+        print(f"[origin] {self.address_string()} {format % args}")
+
+
+def serve(host: str, port: int, cache_dir: str) -> None:
+    OriginHandler.origin = ImageOrigin(cache_dir)
+    server = ThreadingHTTPServer((host, port), OriginHandler)
+    print(f"Jersey image origin on http://{host}:{port} (cache: {cache_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Serve jersey images rendered on first request.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("JERSEY_ORIGIN_PORT", DEFAULT_PORT)))
+    parser.add_argument("--cache-dir", default=os.environ.get("JERSEY_ORIGIN_CACHE", DEFAULT_CACHE_DIR))
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, os.path.abspath(args.cache_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,27 @@
+import argparse
 import concurrent.futures
-import contextlib
-import io
 import os
+import queue
 import shutil
+import time
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Sequence
 
 import pandas as pd
 
 import generate as standard_generator
 import curved_generate as curved_generator
+import job_tasks
+from asset_cache import digit_cache, glyph_cache, nameplate_cache, number_tile_cache, number_tile_mode
+from cost_model import WEAK_RANK_CORRELATION, estimate_job_cost, number_tiles_cost, rank_correlation
+from font_metrics import get_font_metrics
+from job_log import capture_job_log, log
+from memory_budget import PROCESS_BASE_BYTES, MemoryGovernor, estimate_job_peak, memory_budget, workers_for_budget
+from raw_store import default_store_dir, enable_raw_store
+from render_plan import RenderPlan, get_render_plan
+from scheduler import TeamScheduler
+from shard import MANIFEST_NAME, parse_shard, select_shard_rows, write_manifest
+from team_index import get_team_index
 
 try:
     import easygui  # Optional prompt for worker count
@@ -18,7 +30,13 @@ except Exception:  # pragma: no cover - GUI module may be unavailable on headles
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+DEFAULT_OUTPUT_DIR = OUTPUT_DIR
+# Dropped into every output dir a run prepares; only such dirs are ever cleared.
+OUTPUT_MARKER = ".jersey-output"
 ASSETS_ROOT = os.path.join(BASE_DIR, "bin")
+BACKENDS = ("thread", "process")
+# Upper bound on jobs per process-backend task; batches shrink as the run drains.
+MAX_PROCESS_BATCH = 8
 
 # Ensure both engines share the same output target so files land together.
 standard_generator.OUTPUT_DIR = OUTPUT_DIR
@@ -31,8 +49,10 @@ class RowJob:
     row: pd.Series
     order: curved_generator.JerseyOrder
     team_folder: str
-    coords: Dict
+    plan: RenderPlan
     use_curved: bool
+    cost: float = 1.0
+    peak_bytes: int = 0
 
 
 @dataclass
@@ -42,6 +62,38 @@ class JobResult:
     success: bool
     message: str
     captured_log: str
+    elapsed: float = 0.0
+
+
+@dataclass
+class JobSpec:
+    """What a process worker needs to rebuild a RowJob: plain row values, no Series."""
+
+    index: int
+    row: Dict
+    team_folder: str
+
+
+@dataclass
+class JobOutcome:
+    """Small result record sent back from a process worker."""
+
+    index: int
+    pipeline: str
+    success: bool
+    message: str
+    captured_log: str
+    elapsed: float = 0.0
+
+    def to_result(self, job: RowJob) -> JobResult:
+        return JobResult(
+            job=job,
+            pipeline=self.pipeline,
+            success=self.success,
+            message=self.message,
+            captured_log=self.captured_log,
+            elapsed=self.elapsed,
+        )
 
 
 def select_csv_path() -> Optional[str]:
@@ -56,41 +108,67 @@ def read_input_csv(csv_path: str) -> pd.DataFrame:
     return df.dropna(how="all")
 
 
+def set_output_dir(path: str) -> None:
+    global OUTPUT_DIR
+    OUTPUT_DIR = path
+    standard_generator.OUTPUT_DIR = path
+    curved_generator.OUTPUT_DIR = path
+
+
+def is_generated_output_dir(path: str) -> bool:
+    """True for the default output folder (and its shard folders) or a dir a previous run prepared."""
+    path = os.path.normpath(os.path.abspath(path))
+    try:
+        if os.path.commonpath([path, DEFAULT_OUTPUT_DIR]) == DEFAULT_OUTPUT_DIR:
+            return True
+    except ValueError:
+        # Different drives on Windows: not under the default folder.
+        pass
+    return any(os.path.exists(os.path.join(path, name)) for name in (OUTPUT_MARKER, MANIFEST_NAME))
+
+
 def prepare_output_dir() -> None:
-    if os.path.exists(OUTPUT_DIR):
+    """Start OUTPUT_DIR empty; raises ValueError rather than clearing a folder this tool did not create."""
+    if os.path.isdir(OUTPUT_DIR) and os.listdir(OUTPUT_DIR):
+        if not is_generated_output_dir(OUTPUT_DIR):
+            raise ValueError(
+                f"{OUTPUT_DIR} is not empty and was not written by a previous run; "
+                "choose a new or empty --output-dir."
+            )
         shutil.rmtree(OUTPUT_DIR)
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-
-def requires_curved_pipeline(coords: Dict) -> bool:
-    nameplate = coords.get("NamePlate") or {}
-    has_curve = "curve" in nameplate and bool(nameplate["curve"])
-    border_keys = ("NumberBorder", "FrontNumberBorder", "BackNumberBorder")
-    has_number_border = any(key in coords for key in border_keys)
-    return bool(has_curve and has_number_border)
+    open(os.path.join(OUTPUT_DIR, OUTPUT_MARKER), "w").close()
 
 
 def build_job(index: int, row: pd.Series) -> Optional[RowJob]:
     try:
         order = curved_generator.build_order(row)
     except ValueError as exc:
-        print(f"[WARN] Skipping row {index}: {exc}")
+        log(f"[WARN] Skipping row {index}: {exc}")
         return None
 
     try:
         team_folder = curved_generator.locate_team_folder(order)
     except FileNotFoundError as exc:
-        print(f"[WARN] Skipping row {index}: {exc}")
+        log(f"[WARN] Skipping row {index}: {exc}")
         return None
 
     try:
-        coords = curved_generator.load_coords_json(team_folder)
+        plan = get_render_plan(team_folder)
     except Exception as exc:
-        print(f"[WARN] Skipping row {index}: unable to load coords.json - {exc}")
+        log(f"[WARN] Skipping row {index}: unable to load coords.json - {exc}")
         return None
 
-    use_curved = requires_curved_pipeline(coords)
-    return RowJob(index=index, row=row, order=order, team_folder=team_folder, coords=coords, use_curved=use_curved)
+    return RowJob(
+        index=index,
+        row=row,
+        order=order,
+        team_folder=team_folder,
+        plan=plan,
+        use_curved=plan.use_curved,
+        cost=estimate_job_cost(plan, order.jersey_name_text, order.is_youth),
+        peak_bytes=estimate_job_peak(plan),
+    )
 
 
 def collect_jobs(df: pd.DataFrame) -> List[RowJob]:
@@ -102,57 +180,334 @@ def collect_jobs(df: pd.DataFrame) -> List[RowJob]:
     return jobs
 
 
-def is_youth_row(row: pd.Series) -> bool:
-    value = str(row.get("Mens or Youth", "")).strip().lower()
-    return value == "youth"
+def charge_number_tiles(jobs: List[RowJob]) -> None:
+    """Add the tile build to the cost of the first job (in CSV order) using each team/number pair."""
+    seen = set()
+    for job in jobs:
+        key = (job.team_folder, job.order.jersey_number)
+        if key not in seen:
+            seen.add(key)
+            job.cost += number_tiles_cost(job.plan)
+
+
+def warm_number_tiles(jobs: List[RowJob]) -> None:
+    """Prebuild every team's number tiles once so rows only paste them."""
+    teams = {}
+    for job in jobs:
+        teams.setdefault(job.team_folder, job)
+    for team_folder, job in teams.items():
+        print(f"Prebuilding number tiles for {os.path.basename(team_folder)}...")
+        try:
+            if job.use_curved:
+                curved_generator.warm_number_tiles(team_folder, job.plan)
+            else:
+                standard_generator.warm_number_tiles(team_folder, job.plan)
+        except Exception as exc:
+            print(f"[WARN] Unable to prebuild number tiles for {team_folder}: {exc}")
 
 
-def apply_standard_youth_overlays(row: pd.Series, youth_overlay) -> None:
+def load_youth_overlay():
+    youth_overlay = curved_generator.load_youth_overlay()
     if youth_overlay is None:
-        return
-    name_value = str(row.get("Name", "")).strip()
-    if not name_value:
-        return
-    for suffix in ("-1.png", "-2.png", "-3.png"):
-        target_path = os.path.join(OUTPUT_DIR, f"{name_value}{suffix}")
-        if os.path.exists(target_path):
-            standard_generator.apply_overlay_to_file(target_path, youth_overlay)
+        overlay_path = os.path.join(ASSETS_ROOT, "youth.png")
+        if os.path.exists(overlay_path):
+            try:
+                from PIL import Image
+
+                youth_overlay = Image.open(overlay_path).convert("RGBA")
+            except Exception as exc:
+                print(f"[WARN] Unable to load youth overlay from fallback path {overlay_path}: {exc}")
+    return youth_overlay
+
+
+def output_filenames(job: RowJob) -> List[str]:
+    if job.use_curved:
+        stub = job.order.file_stub
+        suffixes = (curved_generator.COMBINED_SUFFIX, curved_generator.BACK_SUFFIX, curved_generator.FRONT_SUFFIX)
+        return [f"{stub}-{suffix}.png" for suffix in suffixes]
+    return [f"{job.row['Name']}-{suffix}.png" for suffix in (1, 2, 3)]
+
+
+def is_youth_row(row: pd.Series) -> bool:
+    value = str(row.get("Mens or Youth", "")).strip().lower()
+    return value == "youth"
 
 
 def process_standard_pipeline(job: RowJob, youth_overlay) -> None:
-    standard_generator.process_front(job.row, job.team_folder, job.coords)
-    standard_generator.process_back(job.row, job.team_folder, job.coords)
-    front_path = os.path.join(OUTPUT_DIR, f"{job.row['Name']}-3.png")
-    back_path = os.path.join(OUTPUT_DIR, f"{job.row['Name']}-2.png")
-    standard_generator.process_combo(job.row, front_path, back_path)
-    if is_youth_row(job.row):
-        apply_standard_youth_overlays(job.row, youth_overlay)
+    # front and back render concurrently; the saves start once both have
+    # rendered, so a failed row writes nothing. The combo joins both renders.
+    overlay = youth_overlay if is_youth_row(job.row) else None
+    name = job.row["Name"]
+    back_future = job_tasks.submit(standard_generator.render_back, job.row, job.team_folder, job.plan)
+    try:
+        front_img = standard_generator.render_front(job.row, job.team_folder, job.plan)
+    except Exception:
+        back_error = job_tasks.abandon(back_future)
+        if back_error is not None:
+            log(f"[WARN] Back render failed too: {back_error}")
+        raise
+    back_img = job_tasks.join(back_future)
+
+    saves = [
+        job_tasks.submit(standard_generator.save_output, front_img, f"{name}-3.png", overlay),
+        job_tasks.submit(standard_generator.save_output, back_img, f"{name}-2.png", overlay),
+    ]
+    try:
+        combo_img = standard_generator.render_combo(front_img, back_img)
+        icc = standard_generator.combo_icc(front_img, back_img)
+        standard_generator.save_output(combo_img, f"{name}-1.png", overlay, icc)
+    finally:
+        job_tasks.wait(saves)
+    for future in saves:
+        future.result()
 
 
 def execute_job(job: RowJob, youth_overlay) -> JobResult:
     pipeline_name = "Curved" if job.use_curved else "Standard"
-    log_buffer = io.StringIO()
-    with contextlib.redirect_stdout(log_buffer):
+    started = time.perf_counter()
+    # Messages from the renderers' log() calls land on this job's JobLog only.
+    with capture_job_log() as job_log:
         try:
             if job.use_curved:
                 curved_generator.process_order(job.order, youth_overlay)
             else:
                 process_standard_pipeline(job, youth_overlay)
             message = "Completed"
-            return JobResult(job=job, pipeline=pipeline_name, success=True, message=message, captured_log=log_buffer.getvalue())
+            return JobResult(
+                job=job,
+                pipeline=pipeline_name,
+                success=True,
+                message=message,
+                captured_log=job_log.getvalue(),
+                elapsed=time.perf_counter() - started,
+            )
         except Exception as exc:
             return JobResult(
                 job=job,
                 pipeline=pipeline_name,
                 success=False,
                 message=str(exc),
-                captured_log=log_buffer.getvalue(),
+                captured_log=job_log.getvalue(),
+                elapsed=time.perf_counter() - started,
+            )
+
+
+# Per-process state for the process backend, filled in by init_process_worker.
+_worker_youth_overlay = None
+
+
+def init_process_worker(
+    output_dir: str,
+    team_folders: Sequence[str],
+    raw_store_dir: Optional[str] = None,
+    job_threads: int = 1,
+) -> None:
+    """ProcessPoolExecutor initializer: warm this worker's caches for the CSV's teams.
+
+    Each worker has its own copy of the asset caches, so the team index, render
+    plans and nameplate font metrics are loaded once here rather than on the
+    first row each worker happens to pick up. Decoded digits and blanks come from
+    the shared raw store when raw_store_dir is set, so they are not per-worker.
+    Number tiles are always built on first use: the pool, not the scheduler,
+    picks the process for each batch, so prebuilding every team here would
+    build (and hold) all tiles once per worker.
+    """
+    global _worker_youth_overlay
+    for module in (standard_generator, curved_generator):
+        module.OUTPUT_DIR = output_dir
+    if raw_store_dir:
+        enable_raw_store(raw_store_dir)
+    job_tasks.set_job_threads(job_threads)
+    get_team_index(curved_generator.get_bin_directories())
+    for team_folder in team_folders:
+        try:
+            get_render_plan(team_folder)
+            font_path = os.path.join(team_folder, "fonts", "NamePlate.otf")
+            if os.path.exists(font_path):
+                get_font_metrics(font_path)
+        except Exception as exc:
+            print(f"[WARN] Unable to preload assets for {team_folder}: {exc}")
+    _worker_youth_overlay = load_youth_overlay()
+
+
+def run_job_specs(specs: List[JobSpec]) -> List[JobOutcome]:
+    """Process-backend task: a batch of same-team jobs run back to back."""
+    return [run_job_spec(spec) for spec in specs]
+
+
+def run_job_spec(spec: JobSpec) -> JobOutcome:
+    """Process-backend entry point: rebuild the job locally and run it."""
+    row = pd.Series(spec.row)
+    pipeline_name = "Standard"
+    try:
+        order = curved_generator.build_order(row)
+        plan = get_render_plan(spec.team_folder)
+        pipeline_name = "Curved" if plan.use_curved else "Standard"
+        job = RowJob(
+            index=spec.index,
+            row=row,
+            order=order,
+            team_folder=spec.team_folder,
+            plan=plan,
+            use_curved=plan.use_curved,
+        )
+    except Exception as exc:
+        return JobOutcome(index=spec.index, pipeline=pipeline_name, success=False, message=str(exc), captured_log="")
+
+    result = execute_job(job, _worker_youth_overlay)
+    return JobOutcome(
+        index=spec.index,
+        pipeline=result.pipeline,
+        success=result.success,
+        message=result.message,
+        captured_log=result.captured_log,
+        elapsed=result.elapsed,
+    )
+
+
+def report_schedule(scheduler: TeamScheduler, governor: Optional[MemoryGovernor] = None) -> None:
+    print(
+        f"Scheduler: {scheduler.team_count} team(s) across {scheduler.worker_count} worker(s), "
+        f"{scheduler.steals} steal(s)."
+    )
+    if governor is not None:
+        print(f"Memory: {governor.summary()}.")
+
+
+def run_thread_backend(
+    jobs: List[RowJob],
+    worker_count: int,
+    youth_overlay,
+    verbose: bool,
+    on_result: Optional[Callable[[JobResult], None]] = None,
+) -> List[JobResult]:
+    # Each thread drains its own teams from the scheduler; results stream back
+    # through a queue with one None per thread marking that it has finished.
+    scheduler = TeamScheduler(jobs, worker_count, cost_of=lambda job: job.cost)
+    governor = MemoryGovernor(memory_budget())
+    result_queue: "queue.Queue[Optional[JobResult]]" = queue.Queue()
+
+    def worker(worker_id: int) -> None:
+        try:
+            while True:
+                job = scheduler.next_job(worker_id)
+                if job is None:
+                    return
+                governor.acquire(job.peak_bytes)
+                try:
+                    result = execute_job(job, youth_overlay)
+                finally:
+                    governor.release(job.peak_bytes)
+                result_queue.put(result)
+        finally:
+            result_queue.put(None)
+
+    results: List[JobResult] = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=scheduler.worker_count) as executor:
+        futures = [executor.submit(worker, worker_id) for worker_id in range(scheduler.worker_count)]
+        running = len(futures)
+        while running:
+            result = result_queue.get()
+            if result is None:
+                running -= 1
+                continue
+            results.append(result)
+            if on_result is None:
+                emit_result(result, verbose=verbose)
+            else:
+                on_result(result)
+        for future in futures:
+            future.result()
+    report_schedule(scheduler, governor)
+    return results
+
+
+def run_process_backend(jobs: List[RowJob], worker_count: int, verbose: bool) -> List[JobResult]:
+    jobs_by_index = {job.index: job for job in jobs}
+    team_folders = sorted({job.team_folder for job in jobs})
+    # Processes already fill the cores; intra-job threads only use what is left over.
+    job_threads = max(1, min(job_tasks.job_thread_count(), (os.cpu_count() or 1) // max(1, worker_count)))
+    initargs = (OUTPUT_DIR, team_folders, default_store_dir(), job_threads)
+    if number_tile_mode() == "prebuild":
+        print("Number tiles are built on first use in each worker process (prebuild applies to the thread backend).")
+    results: List[JobResult] = []
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=worker_count,
+        initializer=init_process_worker,
+        initargs=initargs,
+    ) as executor:
+        # One batch in flight per scheduler slot. The pool decides which process
+        # runs it, so affinity is per batch: each task is a run of one team's jobs.
+        scheduler = TeamScheduler(jobs, worker_count, cost_of=lambda job: job.cost)
+        # Worker processes are children of this one, so their PSS counts too.
+        governor = MemoryGovernor(memory_budget(), include_children=True)
+        pending = {}
+        # Batches the governor held back, retried whenever memory may have freed up.
+        held: List[tuple] = []
+
+        def launch(slot: int, batch: List[RowJob]) -> bool:
+            # A batch runs its jobs one after another, so it needs its largest peak.
+            peak = max(job.peak_bytes for job in batch)
+            if not governor.try_acquire(peak):
+                return False
+            specs = [JobSpec(index=job.index, row=job.row.to_dict(), team_folder=job.team_folder) for job in batch]
+            pending[executor.submit(run_job_specs, specs)] = (slot, peak)
+            return True
+
+        def submit_next(slot: int) -> None:
+            limit = min(MAX_PROCESS_BATCH, max(1, scheduler.remaining // (2 * scheduler.worker_count)))
+            batch = scheduler.next_batch(slot, limit)
+            if batch and not launch(slot, batch):
+                held.append((slot, batch))
+
+        for slot in range(scheduler.worker_count):
+            submit_next(slot)
+        while pending or held:
+            held[:] = [(slot, batch) for slot, batch in held if not launch(slot, batch)]
+            if not pending:
+                continue
+            done, _ = concurrent.futures.wait(
+                pending,
+                timeout=governor.poll_interval if held else None,
+                return_when=concurrent.futures.FIRST_COMPLETED,
             )
+            for future in done:
+                slot, peak = pending.pop(future)
+                governor.release(peak)
+                for outcome in future.result():
+                    result = outcome.to_result(jobs_by_index[outcome.index])
+                    results.append(result)
+                    emit_result(result, verbose=verbose)
+                submit_next(slot)
+    report_schedule(scheduler, governor)
+    return results
+
+
+def report_cost_model(results: List[JobResult]) -> None:
+    """How well estimate_job_cost ranked the jobs that actually ran."""
+    timed = [r for r in results if r.success and r.elapsed > 0]
+    if len(timed) < 2:
+        return
+    correlation = rank_correlation([r.job.cost for r in timed], [r.elapsed for r in timed])
+    seconds_per_unit = sum(r.elapsed for r in timed) / sum(r.job.cost for r in timed)
+    print(f"  Cost model rank corr.:   {'n/a' if correlation is None else f'{correlation:.2f}'}")
+    if correlation is None or correlation < WEAK_RANK_CORRELATION:
+        print(
+            "    (weak for this batch: its jobs cost about the same, or timing noise swamped the "
+            "difference, so costliest-first ordering gained little)"
+        )
+    print(f"  Seconds per cost unit:   {seconds_per_unit:.3f}")
+    for pipeline in ("Standard", "Curved"):
+        subset = [r for r in timed if r.pipeline == pipeline]
+        if subset:
+            est = sum(r.job.cost for r in subset) * seconds_per_unit
+            actual = sum(r.elapsed for r in subset)
+            print(f"    {pipeline + ':':<9} estimated {est:.1f}s, actual {actual:.1f}s over {len(subset)} job(s)")
 
 
 def emit_result(result: JobResult, verbose: bool = False) -> None:
     status = "✓" if result.success else "✗"
-    identifier = f"Row {result.job.index} ({result.order.name})"
+    identifier = f"Row {result.job.index} ({result.job.order.name})"
     print(f"{status} {identifier} – {result.pipeline}: {result.message}")
     if (verbose or not result.success) and result.captured_log.strip():
         print("    └─ Captured output:")
@@ -160,27 +515,61 @@ def emit_result(result: JobResult, verbose: bool = False) -> None:
             print(f"       {line}")
 
 
-def resolve_worker_count(job_count: int) -> int:
+def memory_worker_cap(jobs: List[RowJob], backend: str) -> Optional[int]:
+    """Most workers whose estimated peaks fit in memory; None when memory is unknown.
+
+    Sized on the 90th-percentile job so one huge fan nameplate does not halve
+    the pool; the governor in the backends absorbs the tail. Thread workers
+    share one set of caches, while every worker process fills its own tile,
+    nameplate and glyph caches (and digit cache when the raw store is off).
+    """
+    budget = memory_budget()
+    if budget is None or not jobs:
+        return None
+    peaks = sorted(job.peak_bytes for job in jobs)
+    per_job = peaks[min(len(peaks) - 1, int(len(peaks) * 0.9))]
+    per_process_caches = number_tile_cache.capacity + nameplate_cache.capacity + glyph_cache.capacity
+    if backend == "process":
+        if default_store_dir() is None:
+            per_process_caches += digit_cache.capacity
+        return workers_for_budget(PROCESS_BASE_BYTES + per_process_caches + per_job, budget)
+    return workers_for_budget(per_job, budget, fixed=per_process_caches + digit_cache.capacity)
+
+
+def resolve_worker_count(job_count: int, memory_cap: Optional[int] = None) -> int:
     job_count = max(1, job_count)
     cpu_default = max(1, os.cpu_count() or 1)
     default_workers = min(cpu_default, job_count)
+    if memory_cap is not None and memory_cap < default_workers:
+        print(f"Memory fits about {memory_cap} worker(s); using that instead of {default_workers}.")
+        default_workers = memory_cap
 
     env_value = os.environ.get("JERSEY_WORKERS")
     if env_value:
         try:
             env_workers = int(env_value)
             if env_workers > 0:
+                if memory_cap is not None and env_workers > memory_cap:
+                    print(
+                        f"[WARN] JERSEY_WORKERS={env_workers} exceeds the ~{memory_cap} worker(s) memory allows; "
+                        "new jobs will wait whenever memory runs short."
+                    )
                 return min(env_workers, job_count)
         except ValueError:
             print(f"[WARN] Invalid JERSEY_WORKERS value '{env_value}', falling back to prompt/default.")
 
     if easygui and job_count > 1:
+        # The prompt stays within what memory allows; JERSEY_WORKERS is the override.
+        upper = job_count if memory_cap is None else min(job_count, memory_cap)
+        prompt = "How many worker threads should we use?"
+        if upper < job_count:
+            prompt += f"\n\nMemory fits about {memory_cap} worker(s); set JERSEY_WORKERS to go higher."
         user_value = easygui.integerbox(
-            "How many worker threads should we use?",
+            prompt,
             "Worker Count",
             default=default_workers,
             lowerbound=1,
-            upperbound=max(1, job_count),
+            upperbound=upper,
         )
         if user_value:
             return int(user_value)
@@ -188,40 +577,109 @@ def resolve_worker_count(job_count: int) -> int:
     return default_workers
 
 
-def main() -> None:
-    csv_path = select_csv_path()
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Render jersey images for every row of an order CSV.")
+    parser.add_argument("csv_path", nargs="?", help="Order CSV (prompts with a file picker when omitted).")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=os.environ.get("JERSEY_BACKEND", "thread").strip().lower() or "thread",
+        help="thread: one process, shared caches. process: one worker process per core, for CPU-bound batches.",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="INDEX/COUNT",
+        help="Render only this machine's share of the CSV, e.g. 2/4 (see shard.py for merging).",
+    )
+    parser.add_argument(
+        "--output-dir",
+        help=(
+            "Where to write images (default: ./output, or ./output/shard-INDEX-of-COUNT with --shard). "
+            "An existing non-empty folder is only cleared if a previous run wrote it."
+        ),
+    )
+    args = parser.parse_args(argv)
+    # argparse only checks choices for values given on the command line, not for
+    # a default taken from JERSEY_BACKEND.
+    if args.backend not in BACKENDS:
+        parser.error(f"invalid JERSEY_BACKEND '{args.backend}' (choose from {', '.join(BACKENDS)})")
+    return args
+
+
+def write_shard_manifest(shard, csv_path: str, total_rows: int, results: List[JobResult]) -> None:
+    entries = []
+    for result in sorted(results, key=lambda r: r.job.index):
+        files = [name for name in output_filenames(result.job) if os.path.exists(os.path.join(OUTPUT_DIR, name))]
+        entries.append(
+            {
+                "row": result.job.index,
+                "name": result.job.order.name,
+                "success": result.success,
+                "message": result.message,
+                "files": files,
+            }
+        )
+    path = write_manifest(OUTPUT_DIR, shard, csv_path, total_rows, entries)
+    print(f"  Shard manifest:          {path}")
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    csv_path = args.csv_path or select_csv_path()
     if not csv_path:
         return
 
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as exc:
+            print(f"[ERROR] {exc}")
+            return
+    if args.output_dir:
+        set_output_dir(os.path.abspath(args.output_dir))
+    elif shard:
+        set_output_dir(os.path.join(OUTPUT_DIR, f"shard-{shard[0]}-of-{shard[1]}"))
+
     df = read_input_csv(csv_path)
+    total_rows = len(df)
+    if shard:
+        df = select_shard_rows(df, *shard)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(df)} of {total_rows} row(s).")
     jobs = collect_jobs(df)
     if not jobs:
         print("[ERROR] No valid rows to process. Exiting.")
-        return
-
-    prepare_output_dir()
-    youth_overlay = curved_generator.load_youth_overlay()
-    if youth_overlay is None:
-        overlay_path = os.path.join(ASSETS_ROOT, "youth.png")
-        if os.path.exists(overlay_path):
+        if shard:
+            # An empty shard still reports in, so the merge can tell it ran.
             try:
-                from PIL import Image
-
-                youth_overlay = Image.open(overlay_path).convert("RGBA")
-            except Exception as exc:
-                print(f"[WARN] Unable to load youth overlay from fallback path {overlay_path}: {exc}")
+                prepare_output_dir()
+            except ValueError as exc:
+                print(f"[ERROR] {exc}")
+                return
+            write_shard_manifest(shard, csv_path, total_rows, [])
+        return
 
-    worker_count = resolve_worker_count(len(jobs))
+    try:
+        prepare_output_dir()
+    except ValueError as exc:
+        print(f"[ERROR] {exc}")
+        return
+    if args.backend == "process" or number_tile_mode() != "prebuild":
+        # Prebuilt tiles are paid for before the run starts.
+        charge_number_tiles(jobs)
+    worker_count = resolve_worker_count(len(jobs), memory_worker_cap(jobs, args.backend))
     verbose_logs = os.environ.get("JERSEY_VERBOSE", "0").lower() in {"1", "true", "yes"}
 
-    print(f"Processing {len(jobs)} jobs with {worker_count} thread(s)...")
-    results: List[JobResult] = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=worker_count) as executor:
-        future_to_job = {executor.submit(execute_job, job, youth_overlay): job for job in jobs}
-        for future in concurrent.futures.as_completed(future_to_job):
-            result = future.result()
-            results.append(result)
-            emit_result(result, verbose=verbose_logs)
+    if args.backend == "process":
+        # Workers load their own overlay, plans and fonts in init_process_worker.
+        print(f"Processing {len(jobs)} jobs with {worker_count} worker process(es)...")
+        results = run_process_backend(jobs, worker_count, verbose_logs)
+    else:
+        youth_overlay = load_youth_overlay()
+        if number_tile_mode() == "prebuild":
+            warm_number_tiles(jobs)
+        print(f"Processing {len(jobs)} jobs with {worker_count} thread(s)...")
+        results = run_thread_backend(jobs, worker_count, youth_overlay, verbose_logs)
 
     standard_total = sum(1 for r in results if not r.job.use_curved)
     curved_total = len(results) - standard_total
@@ -233,6 +691,9 @@ def main() -> None:
     print(f"  Curved generator rows:   {curved_total}")
     print(f"  Successful jobs:         {successes}")
     print(f"  Failed jobs:             {failures}")
+    report_cost_model(results)
+    if shard:
+        write_shard_manifest(shard, csv_path, total_rows, results)
 
 
 if __name__ == "__main__":
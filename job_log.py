@@ -0,0 +1,47 @@
+# Per-job log capture - Rally House
+#
+# The renderers report progress through log() instead of print(). While a job
+# runs inside capture_job_log(), its messages are collected on a JobLog bound to
+# a ContextVar, so concurrent jobs on different threads never see each other's
+# output and sys.stdout is never swapped. Outside a capture, log() just prints.
+
+import contextlib
+import contextvars
+from typing import Iterator, List, Optional
+
+
+class JobLog:
+    """Messages logged by one job, in order."""
+
+    __slots__ = ("lines",)
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def write(self, message: str) -> None:
+        self.lines.append(message)
+
+    def getvalue(self) -> str:
+        return "\n".join(self.lines)
+
+
+_current_log: contextvars.ContextVar[Optional[JobLog]] = contextvars.ContextVar("jersey_job_log", default=None)
+
+
+@contextlib.contextmanager
+def capture_job_log() -> Iterator[JobLog]:
+    job_log = JobLog()
+    token = _current_log.set(job_log)
+    try:
+        yield job_log
+    finally:
+        _current_log.reset(token)
+
+
+def log(*args, sep: str = " ") -> None:
+    message = sep.join(str(arg) for arg in args)
+    job_log = _current_log.get()
+    if job_log is None:
+        print(message)
+    else:
+        job_log.write(message)
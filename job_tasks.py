@@ -0,0 +1,110 @@
+# Intra-job task pool - Rally House
+#
+# Front and back renders of one order are independent, and so is the PNG
+# encode of each finished image; only the combo needs both sides. Jobs submit
+# those pieces here so a short CSV (a single urgent reorder) still uses more
+# than one core. The job's own thread is the join: it renders the front
+# itself, and when it needs a task's result (join/wait) it runs the task on
+# the spot if no pool thread has picked it up yet. A busy pool therefore only
+# adds parallelism - it never holds a job thread waiting on queued work, so
+# however many jobs share the pool, none of them is capped by its size, and
+# tasks never wait on other tasks, so it cannot deadlock.
+#
+# JERSEY_JOB_THREADS sets the pool size (default 4); 1 runs everything inline.
+# Tasks run in a copy of the submitter's context, so job_log captures follow them.
+
+import concurrent.futures
+import contextvars
+import os
+import threading
+from typing import Callable, Iterable, Optional
+
+DEFAULT_JOB_THREADS = 4
+
+_pool_lock = threading.Lock()
+_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_thread_count: Optional[int] = None
+
+
+def job_thread_count() -> int:
+    global _thread_count
+    if _thread_count is None:
+        value = os.environ.get("JERSEY_JOB_THREADS", "").strip()
+        try:
+            _thread_count = max(1, int(value)) if value else DEFAULT_JOB_THREADS
+        except ValueError:
+            print(f"[WARN] Invalid JERSEY_JOB_THREADS value '{value}', using {DEFAULT_JOB_THREADS}.")
+            _thread_count = DEFAULT_JOB_THREADS
+    return _thread_count
+
+
+def set_job_threads(count: int) -> None:
+    """Resize the pool (1 = run tasks inline); takes effect for new submissions."""
+    global _pool, _thread_count
+    with _pool_lock:
+        _thread_count = max(1, count)
+        old_pool, _pool = _pool, None
+    if old_pool is not None:
+        old_pool.shutdown(wait=False)
+
+
+class TaskFuture(concurrent.futures.Future):
+    """Future of a submitted task; whichever thread claims it first runs it."""
+
+    def __init__(self, fn: Callable, args, kwargs):
+        super().__init__()
+        self._call = (contextvars.copy_context(), fn, args, kwargs)
+        self._claim_lock = threading.Lock()
+        self._claimed = False
+
+    def run(self) -> None:
+        """Run the task here unless another thread has claimed it (or it was cancelled)."""
+        with self._claim_lock:
+            if self._claimed:
+                return
+            self._claimed = True
+        if not self.set_running_or_notify_cancel():
+            return
+        context, fn, args, kwargs = self._call
+        try:
+            result = context.run(fn, *args, **kwargs)
+        except BaseException as exc:
+            self.set_exception(exc)
+        else:
+            self.set_result(result)
+
+
+def submit(fn: Callable, *args, **kwargs) -> TaskFuture:
+    global _pool
+    future = TaskFuture(fn, args, kwargs)
+    if job_thread_count() <= 1:
+        future.run()
+        return future
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ThreadPoolExecutor(max_workers=job_thread_count(), thread_name_prefix="job-task")
+        pool = _pool
+    pool.submit(future.run)
+    return future
+
+
+def join(future: TaskFuture):
+    """future.result(), running the task on this thread if the pool has not started it."""
+    future.run()
+    return future.result()
+
+
+def wait(futures: Iterable[TaskFuture]) -> None:
+    """Wait for every future to finish (or be cancelled), running unstarted ones here."""
+    futures = list(futures)
+    for future in futures:
+        future.run()
+    concurrent.futures.wait(futures)
+
+
+def abandon(future: TaskFuture) -> Optional[BaseException]:
+    """Cancel future if it has not started, otherwise wait for it and return its exception, if any."""
+    if future.cancel():
+        return None
+    concurrent.futures.wait([future])
+    return future.exception()
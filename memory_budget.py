@@ -0,0 +1,306 @@
+# Memory budget - Rally House
+#
+# Worker counts used to come from the CPU count alone, which gets 16-worker
+# runs OOM-killed on 16 GB agents: curved nameplates render at 2x supersampling
+# on canvases padded for the curve, so one job can briefly hold hundreds of
+# MB. This module
+#   - reads the memory actually available (cgroup v2/v1 limits on this
+#     process's own cgroup and its parents, /proc/meminfo),
+#   - estimates a job's peak working set from its render plan,
+#   - caps the default worker count so the estimated peaks fit, and
+#   - runs a governor that holds back new jobs while the memory of this
+#     process and its worker processes is near the budget. It sums PSS, not
+#     RSS, so pages the workers share (libraries, raw-store mmaps) count once.
+#
+# Without /proc (e.g. Windows) nothing is known and nothing is capped.
+# JERSEY_JOB_PEAK_MB overrides the per-job estimate; JERSEY_MEMORY_BUDGET_MB
+# overrides the measured budget.
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from render_plan import RenderPlan
+
+MB = 1024 * 1024
+DIGIT_DECODE_BYTES = 1931 * 2960 * 4
+BLANK_BYTES = 700 * 1000 * 4
+# Interpreter + pandas + PIL for one worker process.
+PROCESS_BASE_BYTES = 200 * MB
+# Leave this share of the available memory for the OS and everything else.
+HEADROOM_FRACTION = 0.15
+# Live copies of the nameplate canvas at its peak. Later passes work on the
+# cropped text, so the full canvas is held about once (measured: the radius 750
+# fan job peaks ~410 MB over baseline against a 405 MB canvas).
+CANVAS_COPIES = 1
+SUPERSAMPLE = 2
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path, "r", encoding="ascii") as handle:
+            value = handle.read().strip()
+    except OSError:
+        return None
+    if not value or value == "max":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def meminfo_available() -> Optional[int]:
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def _own_cgroups() -> Dict[str, str]:
+    """Controller -> this process's cgroup path, from /proc/self/cgroup ("" is cgroup v2)."""
+    paths: Dict[str, str] = {}
+    try:
+        with open("/proc/self/cgroup", "r", encoding="ascii", errors="replace") as handle:
+            for line in handle:
+                parts = line.rstrip("\n").split(":", 2)
+                if len(parts) == 3:
+                    for controller in parts[1].split(","):
+                        paths[controller] = parts[2]
+    except OSError:
+        pass
+    return paths
+
+
+def _cgroup_room(root: str, cgroup: str, limit_file: str, usage_file: str) -> Optional[int]:
+    """Tightest limit - usage from this process's cgroup up through its ancestors to root.
+
+    Limits usually sit on a parent (the container or systemd slice), not on
+    the leaf the process runs in. Levels not visible under root are skipped.
+    """
+    room = None
+    current = os.path.join(root, cgroup.strip("/"))
+    while True:
+        limit = _read_int(os.path.join(current, limit_file))
+        usage = _read_int(os.path.join(current, usage_file))
+        # cgroup v1 reports "no limit" as a huge page-rounded number.
+        if limit is not None and usage is not None and limit < 1 << 60:
+            level_room = max(0, limit - usage)
+            room = level_room if room is None else min(room, level_room)
+        if os.path.normpath(current) == os.path.normpath(root):
+            return room
+        current = os.path.dirname(os.path.normpath(current))
+
+
+def cgroup_available() -> Optional[int]:
+    """Room left under the tightest memory limit on this process's cgroup, if one is set."""
+    cgroups = _own_cgroups()
+    room = _cgroup_room(CGROUP_ROOT, cgroups.get("", "/"), "memory.max", "memory.current")
+    if room is None:
+        room = _cgroup_room(
+            os.path.join(CGROUP_ROOT, "memory"),
+            cgroups.get("memory", "/"),
+            "memory.limit_in_bytes",
+            "memory.usage_in_bytes",
+        )
+    return room
+
+
+def available_memory() -> Optional[int]:
+    candidates = [value for value in (meminfo_available(), cgroup_available()) if value is not None]
+    return min(candidates) if candidates else None
+
+
+def _statm_private(pid: int) -> int:
+    with open(f"/proc/{pid}/statm", "r", encoding="ascii") as handle:
+        fields = handle.read().split()
+    # resident - shared: file-backed pages (libraries, raw-store mmaps) are
+    # left out rather than counted once per process.
+    return (int(fields[1]) - int(fields[2])) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _pss_of(pid: int) -> int:
+    """Proportional set size of pid: shared pages are split between the processes mapping them."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    # Kernels before 4.14 have no smaps_rollup.
+    try:
+        return _statm_private(pid)
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _scan_child_pids(pid: int) -> List[int]:
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    children = []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r", encoding="ascii", errors="replace") as handle:
+                stat = handle.read()
+            # Field 4 (ppid) follows the parenthesised command name.
+            if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+                children.append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+    return children
+
+
+# The governor polls every 50 ms while jobs are held back; pool workers come
+# and go far less often, so /proc is rescanned for them at most this often.
+CHILD_RESCAN_SECONDS = 1.0
+_children_lock = threading.Lock()
+_children: Tuple[int, float, List[int]] = (0, 0.0, [])
+
+
+def _child_pids(pid: int) -> List[int]:
+    global _children
+    now = time.monotonic()
+    with _children_lock:
+        owner, scanned_at, children = _children
+        if owner != pid or now - scanned_at >= CHILD_RESCAN_SECONDS:
+            children = _scan_child_pids(pid)
+            _children = (pid, now, children)
+        return children
+
+
+def process_tree_pss(include_children: bool = False) -> int:
+    """PSS of this process, plus its child processes if include_children."""
+    pid = os.getpid()
+    total = _pss_of(pid)
+    if include_children:
+        total += sum(_pss_of(child) for child in _child_pids(pid))
+    return total
+
+
+def memory_budget() -> Optional[int]:
+    """Bytes this run may grow to: current PSS plus most of what is still free."""
+    override = os.environ.get("JERSEY_MEMORY_BUDGET_MB", "").strip()
+    if override:
+        try:
+            return int(float(override) * MB)
+        except ValueError:
+            print(f"[WARN] Invalid JERSEY_MEMORY_BUDGET_MB value '{override}', measuring instead.")
+    available = available_memory()
+    if available is None:
+        return None
+    return process_tree_pss() + int(available * (1 - HEADROOM_FRACTION))
+
+
+def estimate_job_peak(plan: RenderPlan) -> int:
+    """Rough peak bytes one job adds on top of the shared caches."""
+    override = os.environ.get("JERSEY_JOB_PEAK_MB", "").strip()
+    if override:
+        try:
+            return int(float(override) * MB)
+        except ValueError:
+            pass
+
+    # Blanks, working copies, the combo canvas and youth overlay, plus the
+    # digit decodes a cold number needs (two digits for front and back).
+    peak = BLANK_BYTES * 8 + DIGIT_DECODE_BYTES * 4
+    nameplate = plan.nameplate
+    if nameplate is not None:
+        curve = plan.nameplate_config.get("curve") or {}
+        width, height = nameplate.width, nameplate.height
+        if plan.use_curved:
+            radius = float(curve.get("radius", 40) or 0) * SUPERSAMPLE
+            extra = 0.0
+            if curve.get("type") == "fan":
+                # Fan letters are composited into their cropped extent only.
+                extra = 150 * SUPERSAMPLE
+            elif curve.get("type") == "circle":
+                extra = radius * 2 + 50 * SUPERSAMPLE
+            canvas_w = (width + extra) * SUPERSAMPLE
+            canvas_h = (height + extra) * SUPERSAMPLE
+        else:
+            canvas_w, canvas_h = width, height
+        peak += int(canvas_w * canvas_h * 4 * CANVAS_COPIES)
+    return peak
+
+
+def workers_for_budget(per_worker: int, budget: Optional[int], fixed: int = 0) -> Optional[int]:
+    """How many workers of per_worker bytes fit in budget after fixed; None = no limit known."""
+    if budget is None or per_worker <= 0:
+        return None
+    return max(1, int((budget - fixed) // per_worker))
+
+
+class MemoryGovernor:
+    """Holds back new jobs while measured PSS plus expected growth exceeds the budget.
+
+    acquire() never blocks when nothing is running, so a run always makes
+    progress even if a single job is larger than the whole budget.
+    """
+
+    def __init__(self, budget: Optional[int], include_children: bool = False, poll_interval: float = 0.05):
+        self.budget = budget
+        self.include_children = include_children
+        self.poll_interval = poll_interval
+        self.running = 0
+        self.reserved = 0
+        self.throttled = 0
+        self.peak_pss = 0
+        self._cond = threading.Condition()
+
+    def pss(self) -> int:
+        value = process_tree_pss(self.include_children)
+        self.peak_pss = max(self.peak_pss, value)
+        return value
+
+    def has_room(self, job_bytes: int) -> bool:
+        if self.budget is None or self.running == 0:
+            return True
+        return self.pss() + self.reserved + job_bytes <= self.budget
+
+    def _start(self, job_bytes: int) -> None:
+        self.running += 1
+        # Stays reserved until the job ends; once its allocations show up in
+        # the PSS samples it is counted twice, which errs on the safe side.
+        self.reserved += job_bytes
+
+    def try_acquire(self, job_bytes: int) -> bool:
+        """Non-blocking acquire for callers with their own wait loop."""
+        with self._cond:
+            if not self.has_room(job_bytes):
+                self.throttled += 1
+                return False
+            self._start(job_bytes)
+            return True
+
+    def acquire(self, job_bytes: int) -> None:
+        with self._cond:
+            if not self.has_room(job_bytes):
+                self.throttled += 1
+                while not self.has_room(job_bytes):
+                    self._cond.wait(self.poll_interval)
+            self._start(job_bytes)
+
+    def release(self, job_bytes: int) -> None:
+        with self._cond:
+            self.running -= 1
+            self.reserved -= job_bytes
+            self._cond.notify_all()
+
+    def summary(self) -> str:
+        if self.budget is None:
+            return "no memory limit detected"
+        return (
+            f"budget {self.budget // MB} MB, peak PSS {self.peak_pss // MB} MB, "
+            f"{self.throttled} start(s) held back"
+        )
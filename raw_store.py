@@ -0,0 +1,142 @@
+# Shared raw RGBA asset store - Rally House
+#
+# Decoded assets (digits, mip levels, blanks) written once as raw RGBA files and
+# memory-mapped read-only by every process that needs them. Image.frombuffer
+# wraps the mapping without copying, so N worker processes share one copy of
+# each decoded asset through the page cache instead of decoding N private ones.
+#
+# Files are keyed by source path, size and mtime, and populated lazily by the
+# first process that asks for an asset. Writing a new version of an asset
+# removes the files of its superseded versions, so the directory stays about
+# the size of the current assets. It can be deleted at any time.
+#
+# JERSEY_RAW_CACHE_DIR picks the directory ("off" disables the store).
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import Dict, Optional
+
+from PIL import Image
+
+from job_log import log
+
+RAW_MAGIC = b"RGBA"
+# magic, width, height, icc length
+_HEADER = struct.Struct("<4sIII")
+_ALIGN = 64
+
+
+def default_store_dir() -> Optional[str]:
+    value = os.environ.get("JERSEY_RAW_CACHE_DIR", "").strip()
+    if value.lower() in {"off", "0", "none"}:
+        return None
+    return value or os.path.join(tempfile.gettempdir(), "jersey_raw_rgba")
+
+
+class RawStore:
+    """Directory of raw RGBA files, one per decoded source PNG."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, source: str) -> str:
+        # <source path hash>-<version hash>: every version of one source shares a prefix.
+        st = os.stat(source)
+        source_id = hashlib.sha1(os.path.abspath(source).encode("utf-8")).hexdigest()
+        version = hashlib.sha1(f"{st.st_size}|{st.st_mtime_ns}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.root, f"{source_id}-{version}.rgba")
+
+    def prune_superseded(self, raw_path: str) -> None:
+        """Delete older versions of raw_path's source."""
+        name = os.path.basename(raw_path)
+        prefix = name.split("-", 1)[0] + "-"
+        try:
+            entries = os.listdir(self.root)
+        except OSError:
+            return
+        for entry in entries:
+            if entry != name and entry.startswith(prefix) and entry.endswith(".rgba"):
+                try:
+                    # Processes that still map the old file keep their pages.
+                    os.remove(os.path.join(self.root, entry))
+                except OSError:
+                    pass
+
+    def write(self, source: str, raw_path: str) -> None:
+        with Image.open(source) as img:
+            icc = img.info.get("icc_profile") or b""
+            rgba = img.convert("RGBA")
+        offset = _pixel_offset(len(icc))
+        tmp_path = f"{raw_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as handle:
+            handle.write(_HEADER.pack(RAW_MAGIC, rgba.width, rgba.height, len(icc)))
+            handle.write(icc)
+            handle.write(b"\0" * (offset - _HEADER.size - len(icc)))
+            handle.write(rgba.tobytes())
+        # Atomic publish; a concurrent writer of the same asset just wins the race.
+        os.replace(tmp_path, raw_path)
+        self.prune_superseded(raw_path)
+
+    def open(self, source: str) -> Image.Image:
+        raw_path = self.path_for(source)
+        if not os.path.exists(raw_path):
+            self.write(source, raw_path)
+        with open(raw_path, "rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, width, height, icc_len = _HEADER.unpack_from(mapped, 0)
+        offset = _pixel_offset(icc_len)
+        if magic != RAW_MAGIC or len(mapped) != offset + width * height * 4:
+            mapped.close()
+            os.remove(raw_path)
+            return self.open(source)
+        # The image keeps the buffer (and so the mapping) alive. It is read-only:
+        # Pillow copies on the first in-place edit, so shared pages never change.
+        img = Image.frombuffer("RGBA", (width, height), memoryview(mapped)[offset:], "raw", "RGBA", 0, 1)
+        if icc_len:
+            img.info["icc_profile"] = bytes(mapped[_HEADER.size:_HEADER.size + icc_len])
+        return img
+
+
+def _pixel_offset(icc_len: int) -> int:
+    end = _HEADER.size + icc_len
+    return (end + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+_store_lock = threading.Lock()
+_active_store: Dict[str, RawStore] = {}
+
+
+def enable_raw_store(root: Optional[str] = None) -> Optional[RawStore]:
+    """Route load_rgba through the store at root (default_store_dir() if None)."""
+    root = root or default_store_dir()
+    with _store_lock:
+        _active_store.clear()
+        if root:
+            _active_store["store"] = RawStore(root)
+        return _active_store.get("store")
+
+
+def disable_raw_store() -> None:
+    with _store_lock:
+        _active_store.clear()
+
+
+def active_raw_store() -> Optional[RawStore]:
+    return _active_store.get("store")
+
+
+def load_rgba(path: str) -> Image.Image:
+    """Decode path as RGBA, from the shared store when one is enabled."""
+    store = active_raw_store()
+    if store is not None:
+        try:
+            return store.open(path)
+        except OSError as exc:
+            log(f"[WARN] Raw asset store unavailable for {path}: {exc}")
+    with Image.open(path) as img:
+        return img.convert("RGBA")
@@ -0,0 +1,254 @@
+# Local render daemon - Rally House
+#
+# Keeps one warm Python process around so small submissions skip interpreter
+# start-up, pandas/PIL imports and cold font/digit/tile caches.
+#
+#   python render_daemon.py serve [--port 8765] [--workers N]
+#   python render_daemon.py submit orders.csv        (or: submit --json orders.json)
+#
+# HTTP on 127.0.0.1 only:
+#   POST /render   {"csv": "path/to/orders.csv"} or {"orders": [{<CSV columns>}, ...]}
+#                  optional "output_dir". The response streams one JSON line per
+#                  job as it finishes, then a {"done": true, ...} summary line.
+#   POST /reload   drop cached digits, tiles, nameplates, glyphs and the team index
+#   GET  /health   cache statistics
+#
+# Submissions are rendered one at a time (each one still uses every worker
+# thread), because the output dir is process-wide state of the generators.
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import jersey_generator
+from asset_cache import digit_cache, font_cache_stats, glyph_cache, nameplate_cache, number_tile_cache
+from curved_generate import get_bin_directories
+from job_log import capture_job_log
+from team_index import get_team_index, reset_team_index
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class RenderService:
+    """Warm state shared by every request: youth overlay, worker count, caches."""
+
+    def __init__(self, worker_count: Optional[int] = None):
+        self.worker_count = worker_count or max(1, os.cpu_count() or 1)
+        # Requests without "output_dir" write here, never to a previous request's dir.
+        self.default_output_dir = jersey_generator.OUTPUT_DIR
+        self.youth_overlay = jersey_generator.load_youth_overlay()
+        self.render_lock = threading.Lock()
+        get_team_index(get_bin_directories())
+
+    def refresh_team_index(self) -> None:
+        # New or renamed team folders show up without restarting the daemon.
+        if not get_team_index(get_bin_directories()).is_current():
+            reset_team_index()
+            get_team_index(get_bin_directories())
+
+    def reload(self) -> None:
+        for cache in (digit_cache, number_tile_cache, nameplate_cache, glyph_cache):
+            cache.clear()
+        reset_team_index()
+        get_team_index(get_bin_directories())
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.worker_count,
+            "digits": digit_cache.stats(),
+            "number_tiles": number_tile_cache.stats(),
+            "nameplates": nameplate_cache.stats(),
+            "glyphs": glyph_cache.stats(),
+            "fonts": font_cache_stats(),
+        }
+
+    def render(self, df: pd.DataFrame, output_dir: Optional[str], send) -> Dict:
+        """Render df's rows, calling send(record) for each row as it completes."""
+        started = time.perf_counter()
+        with self.render_lock:
+            # The output dir is generator-module state; hold it for this request only.
+            previous_output_dir = jersey_generator.OUTPUT_DIR
+            jersey_generator.set_output_dir(os.path.abspath(output_dir) if output_dir else self.default_output_dir)
+            try:
+                return self._render_locked(df, send, started)
+            finally:
+                jersey_generator.set_output_dir(previous_output_dir)
+
+    def _render_locked(self, df: pd.DataFrame, send, started: float) -> Dict:
+        os.makedirs(jersey_generator.OUTPUT_DIR, exist_ok=True)
+        self.refresh_team_index()
+
+        jobs: List[jersey_generator.RowJob] = []
+        for index, row in df.iterrows():
+            with capture_job_log() as job_log:
+                job = jersey_generator.build_job(index, row)
+            if job is None:
+                send({"row": index, "name": str(row.get("Name", "")), "success": False, "message": job_log.getvalue()})
+            else:
+                jobs.append(job)
+
+        def on_result(result: jersey_generator.JobResult) -> None:
+            send(
+                {
+                    "row": result.job.index,
+                    "name": result.job.order.name,
+                    "pipeline": result.pipeline,
+                    "success": result.success,
+                    "message": result.message,
+                    "elapsed": round(result.elapsed, 4),
+                    "files": jersey_generator.output_filenames(result.job),
+                    "log": result.captured_log,
+                }
+            )
+
+        results = []
+        if jobs:
+            worker_count = min(self.worker_count, len(jobs))
+            results = jersey_generator.run_thread_backend(
+                jobs, worker_count, self.youth_overlay, False, on_result=on_result
+            )
+        return {
+            "done": True,
+            "rows": len(df),
+            "jobs": len(jobs),
+            "succeeded": sum(1 for r in results if r.success),
+            "output_dir": jersey_generator.OUTPUT_DIR,
+            "elapsed": round(time.perf_counter() - started, 4),
+        }
+
+
+def request_frame(payload: Dict) -> pd.DataFrame:
+    if payload.get("csv"):
+        return jersey_generator.read_input_csv(payload["csv"])
+    orders = payload.get("orders")
+    if not isinstance(orders, list) or not orders:
+        raise ValueError('Body must contain "csv" (a path) or "orders" (a non-empty list of rows).')
+    return pd.DataFrame(orders).dropna(how="all")
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    service: RenderService = None  # set by serve()
+
+    def _send_json(self, status: int, body: Dict) -> None:
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, self.service.stats())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path == "/reload":
+            self.service.reload()
+            self._send_json(200, {"reloaded": True})
+            return
+        if self.path != "/render":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            df = request_frame(payload)
+        except Exception as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+
+        # NDJSON, one line per job; the connection closes after the summary line.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+
+        def send(record: Dict) -> None:
+            self.wfile.write(json.dumps(record, default=str).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+        try:
+            send(self.service.render(df, payload.get("output_dir"), send))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as exc:
+            send({"done": True, "error": str(exc)})
+
+    def log_message(self, format, *args):
+        print(f"[daemon] {self.address_string()} {format % args}")
+
+
+def serve(host: str, port: int, worker_count: Optional[int]) -> None:
+    RenderHandler.service = RenderService(worker_count)
+    server = ThreadingHTTPServer((host, port), RenderHandler)
+    print(f"Render daemon listening on http://{host}:{port} with {RenderHandler.service.worker_count} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def submit(url: str, payload: Dict) -> int:
+    request = urllib.request.Request(
+        f"{url}/render",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    failures = 0
+    with urllib.request.urlopen(request) as response:
+        for line in response:
+            record = json.loads(line)
+            if record.get("done"):
+                print(json.dumps(record))
+                if record.get("error"):
+                    failures += 1
+            else:
+                status = "✓" if record["success"] else "✗"
+                print(f"{status} Row {record['row']} ({record['name']}): {record.get('message', '').strip()}")
+                failures += 0 if record["success"] else 1
+    return 1 if failures else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Warm local jersey render daemon.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="Run the daemon in the foreground.")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=int(os.environ.get("JERSEY_DAEMON_PORT", DEFAULT_PORT)))
+    serve_parser.add_argument("--workers", type=int, default=None)
+    submit_parser = sub.add_parser("submit", help="Send orders to a running daemon and print results as they finish.")
+    submit_parser.add_argument("source", help="CSV path, or a JSON file with a list of order rows when --json is given.")
+    submit_parser.add_argument("--json", action="store_true")
+    submit_parser.add_argument("--output-dir")
+    submit_parser.add_argument("--url", default=f"http://{DEFAULT_HOST}:{os.environ.get('JERSEY_DAEMON_PORT', DEFAULT_PORT)}")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.workers)
+        return 0
+
+    if args.json:
+        with open(args.source, "r", encoding="utf-8") as handle:
+            payload = {"orders": json.load(handle)}
+    else:
+        payload = {"csv": os.path.abspath(args.source)}
+    if args.output_dir:
+        payload["output_dir"] = os.path.abspath(args.output_dir)
+    return submit(args.url.rstrip("/"), payload)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
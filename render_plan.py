@@ -0,0 +1,150 @@
+# Render plans - Rally House
+#
+# coords.json compiled once per team folder into an immutable plan: integer
+# boxes, resolved rotations, border configs and the curved-vs-standard pipeline
+# decision. Plans are cached per folder and rebuilt only when coords.json's
+# mtime changes, so the per-row path does no JSON parsing or dict fallbacks.
+
+import copy
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+COORDS_FILENAME = "coords.json"
+SHOULDER_KEYS = ("FLShoulder", "FRShoulder", "BLShoulder", "BRShoulder")
+
+
+def requires_curved_pipeline(coords: Dict) -> bool:
+    nameplate = coords.get("NamePlate") or {}
+    has_curve = "curve" in nameplate and bool(nameplate["curve"])
+    border_keys = ("NumberBorder", "FrontNumberBorder", "BackNumberBorder")
+    has_number_border = any(key in coords for key in border_keys)
+    return bool(has_curve and has_number_border)
+
+
+class _Frozen:
+    """__slots__ base whose attributes can only be set during __init__."""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _init(self, **values) -> None:
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        self._init(**state)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class BoxSpec(_Frozen):
+    """A coords.json box: raw coords, rounded corners and a resolved rotation."""
+
+    __slots__ = ("coords", "box", "width", "height", "rotation")
+
+    def __init__(self, coords, rotation: float = 0):
+        coords = tuple(coords)
+        box = tuple(int(round(c)) for c in coords)
+        self._init(
+            coords=coords,
+            box=box,
+            width=box[2] - box[0],
+            height=box[3] - box[1],
+            rotation=rotation,
+        )
+
+    @classmethod
+    def from_entry(cls, entry, default_rotation: float = 0) -> Optional["BoxSpec"]:
+        """Accept both the list form and the {"coords": ..., "rotation": ...} form."""
+        if not entry:
+            return None
+        if isinstance(entry, dict):
+            if "coords" not in entry:
+                return None
+            return cls(entry["coords"], entry.get("rotation", default_rotation))
+        return cls(entry, default_rotation)
+
+
+class RenderPlan(_Frozen):
+    """Everything the renderers need from one team's coords.json."""
+
+    __slots__ = (
+        "team_folder",
+        "mtime_ns",
+        "coords",
+        "nameplate",
+        "nameplate_config",
+        "front_number",
+        "back_number",
+        "shoulders",
+        "front_number_border",
+        "back_number_border",
+        "front_shoulder_border",
+        "back_shoulder_border",
+        "use_curved",
+    )
+
+    def __init__(self, team_folder: str, coords: Dict, mtime_ns: int = 0):
+        # Private copy so callers mutating their dict cannot change a shared plan.
+        coords = copy.deepcopy(coords)
+        nameplate_config = coords.get("NamePlate") or {}
+        nameplate_rotation = nameplate_config.get("rotation", 0)
+        shoulders = {key: BoxSpec.from_entry(coords.get(key)) for key in SHOULDER_KEYS}
+        self._init(
+            team_folder=team_folder,
+            mtime_ns=mtime_ns,
+            coords=coords,
+            nameplate=BoxSpec.from_entry(nameplate_config, nameplate_rotation),
+            nameplate_config=nameplate_config,
+            front_number=BoxSpec.from_entry(coords.get("FrontNumber"), nameplate_rotation),
+            back_number=BoxSpec.from_entry(coords.get("BackNumber"), nameplate_rotation),
+            shoulders=shoulders,
+            front_number_border=coords.get("FrontNumberBorder") or coords.get("NumberBorder"),
+            back_number_border=coords.get("BackNumberBorder") or coords.get("NumberBorder"),
+            front_shoulder_border=coords.get("FrontShoulderBorder"),
+            back_shoulder_border=coords.get("BackShoulderBorder"),
+            use_curved=requires_curved_pipeline(coords),
+        )
+
+    @classmethod
+    def ensure(cls, team_folder: str, plan_or_coords) -> "RenderPlan":
+        """Pass plans through; compile a raw coords dict for older callers."""
+        if isinstance(plan_or_coords, cls):
+            return plan_or_coords
+        return cls(team_folder, plan_or_coords)
+
+
+_plan_lock = threading.Lock()
+_plans: Dict[str, RenderPlan] = {}
+
+
+def coords_path_for(team_folder: str) -> str:
+    return os.path.join(team_folder, COORDS_FILENAME)
+
+
+def get_render_plan(team_folder: str) -> RenderPlan:
+    """Cached plan for team_folder, recompiled when coords.json changes."""
+    key = os.path.normpath(team_folder)
+    path = coords_path_for(key)
+    mtime_ns = os.stat(path).st_mtime_ns
+    with _plan_lock:
+        plan = _plans.get(key)
+    if plan is not None and plan.mtime_ns == mtime_ns:
+        return plan
+
+    with open(path, "r", encoding="utf-8") as handle:
+        coords = json.load(handle)
+    plan = RenderPlan(team_folder, coords, mtime_ns)
+    with _plan_lock:
+        _plans[key] = plan
+    return plan
+
@@ -0,0 +1,96 @@
+# Team-affinity job scheduler - Rally House
+#
+# Order exports are sorted by SKU, so consecutive rows usually belong to
+# different teams and every worker keeps touching every team's digits, blanks
+# and fonts. The scheduler groups jobs by team folder, gives each worker whole
+# teams (most expensive groups first, to the least-loaded worker) and hands each
+# worker its own teams one job or batch at a time, costliest jobs first (see
+# cost_model.py). A worker that runs out steals from the most loaded worker that
+# has anything to give: a whole team it has not started if there is one,
+# otherwise the back half of the team it is working on.
+
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Generic, Hashable, List, Optional, Sequence, TypeVar
+
+JobT = TypeVar("JobT")
+
+
+class _TeamQueue(Generic[JobT]):
+    __slots__ = ("key", "jobs")
+
+    def __init__(self, key: Hashable, jobs):
+        self.key = key
+        self.jobs: Deque[JobT] = deque(jobs)
+
+
+class TeamScheduler(Generic[JobT]):
+    def __init__(
+        self,
+        jobs: Sequence[JobT],
+        worker_count: int,
+        team_of: Callable[[JobT], Hashable] = lambda job: job.team_folder,
+        cost_of: Callable[[JobT], float] = lambda job: 1.0,
+    ):
+        self.worker_count = max(1, worker_count)
+        self._cost_of = cost_of
+        groups: Dict[Hashable, List[JobT]] = {}
+        for job in jobs:
+            groups.setdefault(team_of(job), []).append(job)
+
+        self._lock = threading.Lock()
+        self._queues: List[Deque[_TeamQueue[JobT]]] = [deque() for _ in range(self.worker_count)]
+        loads = [0.0] * self.worker_count
+        costs = {key: sum(cost_of(job) for job in team_jobs) for key, team_jobs in groups.items()}
+        # Costliest team first onto the least-loaded worker (LPT); ties keep CSV order.
+        for key, team_jobs in sorted(groups.items(), key=lambda item: -costs[item[0]]):
+            worker_id = loads.index(min(loads))
+            team_jobs.sort(key=lambda job: -cost_of(job))
+            self._queues[worker_id].append(_TeamQueue(key, team_jobs))
+            loads[worker_id] += costs[key]
+
+        self.team_count = len(groups)
+        self.remaining = len(jobs)
+        self.steals = 0
+
+    def _load(self, worker_id: int) -> float:
+        return sum(self._cost_of(job) for team in self._queues[worker_id] for job in team.jobs)
+
+    def _steal_locked(self, thief: int) -> bool:
+        # Most loaded victim first; one that has nothing stealable (a single
+        # team down to its last job) must not stop the thief from trying the rest.
+        loads = {worker_id: self._load(worker_id) for worker_id in range(self.worker_count) if worker_id != thief}
+        for victim in sorted(loads, key=lambda worker_id: -loads[worker_id]):
+            victim_queue = self._queues[victim]
+            if len(victim_queue) > 1:
+                # A team the victim has not started keeps full locality on the thief.
+                self._queues[thief].append(victim_queue.pop())
+            elif victim_queue and len(victim_queue[0].jobs) >= 2:
+                current = victim_queue[0]
+                stolen = [current.jobs.pop() for _ in range(len(current.jobs) // 2)]
+                stolen.reverse()
+                self._queues[thief].append(_TeamQueue(current.key, stolen))
+            else:
+                continue
+            self.steals += 1
+            return True
+        return False
+
+    def next_batch(self, worker_id: int, limit: int = 1) -> List[JobT]:
+        """Up to limit jobs from one team for worker_id; [] when all work is done."""
+        with self._lock:
+            queue = self._queues[worker_id]
+            while queue and not queue[0].jobs:
+                queue.popleft()
+            if not queue and not self._steal_locked(worker_id):
+                return []
+            team = queue[0]
+            batch = [team.jobs.popleft() for _ in range(min(max(1, limit), len(team.jobs)))]
+            if not team.jobs:
+                queue.popleft()
+            self.remaining -= len(batch)
+            return batch
+
+    def next_job(self, worker_id: int) -> Optional[JobT]:
+        batch = self.next_batch(worker_id, 1)
+        return batch[0] if batch else None
@@ -0,0 +1,192 @@
+# Multi-machine sharding - Rally House
+#
+# Splits one order CSV across several render boxes with no coordinator: every
+# node reads the same CSV, runs the same deterministic partition and renders
+# only its share ("python jersey_generator.py orders.csv --shard 2/4").
+#
+# Rows are grouped by team/color (from the CSV columns, not the asset tree, so
+# nodes agree even if their bin/ copies differ) and whole teams are packed onto
+# the least-loaded shard, keeping each team's assets hot on one machine. A team
+# bigger than a fair share is cut into pieces by a hash of the Name column.
+#
+# Each shard writes MANIFEST_NAME into its output dir. Merge the shard dirs
+# (plain shared folders) with:
+#   python shard.py merge DEST_DIR SHARD_DIR [SHARD_DIR ...]
+# which refuses to copy anything if two rows claim the same output file name.
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import sys
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+from team_index import normalized
+
+MANIFEST_NAME = "shard-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """'INDEX/COUNT' with a 1-based INDEX, e.g. '2/4' is the second of four."""
+    try:
+        index_text, count_text = value.split("/", 1)
+        index, count = int(index_text), int(count_text)
+    except ValueError:
+        raise ValueError(f"Shard must look like INDEX/COUNT (e.g. 2/4), got '{value}'") from None
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard index must be between 1 and {count}, got '{value}'")
+    return index, count
+
+
+def name_hash(name: str) -> str:
+    return hashlib.sha1((name or "").strip().encode("utf-8")).hexdigest()
+
+
+def row_team_key(row) -> str:
+    parts = (row.get("Sport Specific", ""), row.get("Team", ""), row.get("Color List", ""))
+    return "|".join(normalized(str(part)) for part in parts)
+
+
+def assign_shards(rows: Sequence[Tuple[Hashable, str, str]], count: int) -> Dict[Hashable, int]:
+    """Map row ids to 1-based shards. rows are (row id, Name, team key) triples.
+
+    Pure function of its input: teams largest first (ties by key) onto the
+    least-loaded shard (ties to the lowest index); oversized teams are split
+    into name-hash-ordered pieces no larger than a fair share.
+    """
+    teams: Dict[str, List[Tuple[Hashable, str]]] = {}
+    for row_id, name, team_key in rows:
+        teams.setdefault(team_key, []).append((row_id, name))
+
+    capacity = max(1, math.ceil(len(rows) / count))
+    pieces: List[Tuple[str, List[Hashable]]] = []
+    for team_key, members in teams.items():
+        members.sort(key=lambda member: (name_hash(member[1]), str(member[0])))
+        for start in range(0, len(members), capacity):
+            pieces.append((f"{team_key}#{start}", [row_id for row_id, _ in members[start:start + capacity]]))
+
+    loads = [0] * count
+    assignment: Dict[Hashable, int] = {}
+    for _, row_ids in sorted(pieces, key=lambda piece: (-len(piece[1]), piece[0])):
+        shard = loads.index(min(loads))
+        loads[shard] += len(row_ids)
+        for row_id in row_ids:
+            assignment[row_id] = shard + 1
+    return assignment
+
+
+def select_shard_rows(df, index: int, count: int):
+    """The rows of df that belong to shard index of count."""
+    rows = [(row_id, str(row.get("Name", "")), row_team_key(row)) for row_id, row in df.iterrows()]
+    assignment = assign_shards(rows, count)
+    return df[[assignment[row_id] == index for row_id in df.index]]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(output_dir: str, shard: Tuple[int, int], csv_path: str, total_rows: int, entries: List[Dict]) -> str:
+    """entries: one dict per rendered row with row, name, success, message and files."""
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "shard": list(shard),
+        "csv_sha256": file_sha256(csv_path),
+        "csv_rows": total_rows,
+        "rows": entries,
+    }
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2, default=str)
+    return path
+
+
+def load_manifest(shard_dir: str) -> Dict:
+    path = os.path.join(shard_dir, MANIFEST_NAME)
+    with open(path, "r", encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"{path}: unsupported manifest version {manifest.get('version')}")
+    return manifest
+
+
+def merge_shards(dest_dir: str, shard_dirs: Sequence[str]) -> List[str]:
+    """Copy every shard's files into dest_dir; return a list of problems.
+
+    Nothing is copied when a file name is claimed twice or the manifests come
+    from different CSVs or shard counts.
+    """
+    problems: List[str] = []
+    manifests = []
+    for shard_dir in shard_dirs:
+        try:
+            manifests.append((shard_dir, load_manifest(shard_dir)))
+        except (OSError, ValueError) as exc:
+            problems.append(f"{shard_dir}: unable to read manifest - {exc}")
+    if problems:
+        return problems
+
+    csv_hashes = {manifest["csv_sha256"] for _, manifest in manifests}
+    counts = {manifest["shard"][1] for _, manifest in manifests}
+    if len(csv_hashes) > 1:
+        problems.append("Shards were rendered from different CSV files.")
+    if len(counts) > 1:
+        problems.append(f"Shards disagree on the shard count: {sorted(counts)}.")
+
+    seen_shards: Dict[int, str] = {}
+    owners: Dict[str, str] = {}
+    copies: List[Tuple[str, str]] = []
+    for shard_dir, manifest in manifests:
+        index = manifest["shard"][0]
+        if index in seen_shards:
+            problems.append(f"Shard {index} given twice: {seen_shards[index]} and {shard_dir}.")
+        seen_shards[index] = shard_dir
+        for entry in manifest["rows"]:
+            for filename in entry.get("files", []):
+                owner = f"{shard_dir} row {entry['row']} ({entry['name']})"
+                if filename in owners:
+                    problems.append(f"File name collision: {filename} from {owners[filename]} and {owner}.")
+                    continue
+                owners[filename] = owner
+                copies.append((os.path.join(shard_dir, filename), filename))
+    if problems:
+        return problems
+
+    expected = counts.pop() if counts else 0
+    missing = sorted(set(range(1, expected + 1)) - set(seen_shards))
+    if missing:
+        print(f"[WARN] Merging without shard(s) {', '.join(map(str, missing))} of {expected}.")
+
+    os.makedirs(dest_dir, exist_ok=True)
+    for source, filename in copies:
+        if not os.path.exists(source):
+            problems.append(f"{source} is listed in its manifest but missing on disk.")
+            continue
+        shutil.copy2(source, os.path.join(dest_dir, filename))
+    print(f"Merged {len(copies)} file(s) from {len(manifests)} shard(s) into {dest_dir}.")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Merge jersey_generator --shard output directories.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    merge = sub.add_parser("merge", help="Combine shard output dirs and check for file name collisions.")
+    merge.add_argument("dest_dir")
+    merge.add_argument("shard_dirs", nargs="+")
+    args = parser.parse_args(argv)
+
+    problems = merge_shards(args.dest_dir, args.shard_dirs)
+    for problem in problems:
+        print(f"[ERROR] {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
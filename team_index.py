@@ -0,0 +1,164 @@
+# Team asset index - Rally House
+#
+# In-memory index of every team/color asset folder under the bin/ roots, built
+# once per run so order lookups do not re-list the sport folders for every row.
+# Exact matches are a dict lookup; the fuzzy prefix fallback uses a sorted list.
+#
+# Set JERSEY_TEAM_INDEX_CACHE to a file path to persist the index between runs.
+# The snapshot is discarded whenever a bin or sport directory mtime changes.
+
+import bisect
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SNAPSHOT_VERSION = 1
+
+
+def normalized(value: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", (value or "").lower())
+
+
+class TeamIndex:
+    """(bin dir, sport, normalized folder name) -> team folder path."""
+
+    def __init__(self, bin_dirs: List[str], folders: Dict[str, Dict[str, List[str]]], mtimes: Dict[str, int]):
+        self.bin_dirs = list(bin_dirs)
+        # folders[bin_dir][sport] = folder names as listed on disk
+        self.folders = folders
+        self.mtimes = mtimes
+        self._exact: Dict[Tuple[str, str, str], str] = {}
+        self._sorted: Dict[Tuple[str, str], List[str]] = {}
+        for bin_dir, sports in folders.items():
+            for sport, names in sports.items():
+                norms = []
+                for name in names:
+                    norm = normalized(name)
+                    if not norm:
+                        continue
+                    key = (bin_dir, sport, norm)
+                    if key not in self._exact:
+                        self._exact[key] = os.path.join(bin_dir, sport, name)
+                        norms.append(norm)
+                self._sorted[(bin_dir, sport)] = sorted(norms)
+
+    @classmethod
+    def build(cls, bin_dirs: List[str]) -> "TeamIndex":
+        folders: Dict[str, Dict[str, List[str]]] = {}
+        mtimes: Dict[str, int] = {}
+        for bin_dir in bin_dirs:
+            mtimes[bin_dir] = os.stat(bin_dir).st_mtime_ns
+            sports: Dict[str, List[str]] = {}
+            for sport in sorted(os.listdir(bin_dir)):
+                sport_dir = os.path.join(bin_dir, sport)
+                if not os.path.isdir(sport_dir):
+                    continue
+                mtimes[sport_dir] = os.stat(sport_dir).st_mtime_ns
+                sports[sport] = sorted(
+                    entry for entry in os.listdir(sport_dir) if os.path.isdir(os.path.join(sport_dir, entry))
+                )
+            folders[bin_dir] = sports
+        return cls(bin_dirs, folders, mtimes)
+
+    def is_current(self) -> bool:
+        for path, mtime_ns in self.mtimes.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def lookup(self, sport: str, targets: Iterable[str]) -> Optional[str]:
+        """Find a folder for already-normalized candidate names, best first.
+
+        Exact matches in any bin win over prefix matches; within the fuzzy pass
+        a folder extending the target beats a folder that is a prefix of it.
+        """
+        targets = [t for t in targets if t]
+        for bin_dir in self.bin_dirs:
+            for target in targets:
+                path = self._exact.get((bin_dir, sport, target))
+                if path:
+                    return path
+
+        for bin_dir in self.bin_dirs:
+            norms = self._sorted.get((bin_dir, sport))
+            if not norms:
+                continue
+            for target in targets:
+                pos = bisect.bisect_left(norms, target)
+                if pos < len(norms) and norms[pos].startswith(target):
+                    return self._exact[(bin_dir, sport, norms[pos])]
+                for cut in range(len(target) - 1, 0, -1):
+                    path = self._exact.get((bin_dir, sport, target[:cut]))
+                    if path:
+                        return path
+        return None
+
+    def to_snapshot(self) -> Dict:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "bin_dirs": self.bin_dirs,
+            "folders": self.folders,
+            "mtimes": self.mtimes,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: Dict) -> Optional["TeamIndex"]:
+        if data.get("version") != SNAPSHOT_VERSION:
+            return None
+        return cls(data["bin_dirs"], data["folders"], data["mtimes"])
+
+
+def _load_snapshot(path: str, bin_dirs: List[str]) -> Optional[TeamIndex]:
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            index = TeamIndex.from_snapshot(json.load(handle))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if index is None or index.bin_dirs != list(bin_dirs) or not index.is_current():
+        return None
+    return index
+
+
+def _save_snapshot(path: str, index: TeamIndex) -> None:
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(index.to_snapshot(), handle)
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        print(f"[WARN] Unable to write team index snapshot {path}: {exc}")
+
+
+_index_lock = threading.Lock()
+_indexes: Dict[Tuple[str, ...], TeamIndex] = {}
+
+
+def get_team_index(bin_dirs: List[str], snapshot_path: Optional[str] = None) -> TeamIndex:
+    """Return the run-wide index for bin_dirs, building it on first use."""
+    key = tuple(bin_dirs)
+    with _index_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            return index
+
+        snapshot_path = snapshot_path or os.environ.get("JERSEY_TEAM_INDEX_CACHE")
+        if snapshot_path:
+            index = _load_snapshot(snapshot_path, bin_dirs)
+        if index is None:
+            index = TeamIndex.build(list(bin_dirs))
+            if snapshot_path:
+                _save_snapshot(snapshot_path, index)
+        _indexes[key] = index
+        return index
+
+
+def reset_team_index() -> None:
+    """Drop cached indexes so the next lookup rescans (e.g. after adding a team)."""
+    with _index_lock:
+        _indexes.clear()
@@ -0,0 +1,299 @@
+# Nameplate glyph layout - Rally House
+#
+# Fan and circle nameplates place every letter on its own rotated cell. They
+# used to draw each letter into a padded sub-image, rotate it with expand=True,
+# and paste it onto a canvas sized for the whole curve (radius * 3 + padding at
+# 2x supersampling, so hundreds of MB for wide fans). Each fan was then cropped
+# back down with a getbbox() over that whole canvas.
+#
+# This engine works out every glyph's placement up front, using vectorized trig
+# and prefix sums. Each distinct letter (font, size, char, colours, outline) is
+# rasterized once into a cached sprite. Each sprite is then placed by the same
+# affine mapping the old rotate(expand=True) + paste applied to the whole cell,
+# evaluated only over the sprite's footprint, so output pixels do not change.
+# A fan canvas is allocated only at its final cropped size.
+#
+# Straight, arc and wave nameplates (and the standard renderer) draw letters
+# upright at fractional pen positions. glyph_mask() caches FreeType's coverage
+# mask and bearing per letter and subpixel class, so a batch rasterizes each
+# letter of a team font a handful of times instead of once per order.
+
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from asset_cache import file_digest, get_glyph
+from border_engine import dilate_text_mask
+
+Box = Tuple[int, int, int, int]
+# Glyph cell padding of the fan and circle layouts (the old sub-image margins).
+FAN_CELL_PADDING = 40
+CIRCLE_CELL_PADDING = 10
+
+
+@dataclass(frozen=True)
+class GlyphCell:
+    """One letter's layout cell: a padded box rotated about its centre onto the canvas."""
+
+    char: str
+    width: int
+    height: int
+    padding: int
+    angle: float
+    center: Tuple[float, float]
+    # The fan layout rounds the paste position; the circle layout truncates it.
+    round_position: bool
+
+
+@dataclass(frozen=True)
+class PlacedGlyph:
+    image: Image.Image
+    position: Tuple[int, int]
+
+
+def fan_cells(char_widths: Sequence[int], text: str, font_size: int, box_width: int, box_height: int, curve_config) -> List[GlyphCell]:
+    total_angle = curve_config.get("angle", 60)
+    radius = curve_config.get("radius", 80)
+    center_x = box_width // 2
+    center_y = min(box_height - 5, box_height * 0.85)
+    count = len(text)
+    angle_step = total_angle / (count - 1) if count > 1 else 0
+    angles = -total_angle / 2 + np.arange(count) * angle_step
+    radians = np.radians(angles)
+    xs = center_x + radius * np.sin(radians)
+    ys = center_y - radius * np.cos(radians)
+    height = font_size + FAN_CELL_PADDING * 2
+    return [
+        GlyphCell(char, char_widths[i] + FAN_CELL_PADDING * 2, height, FAN_CELL_PADDING, float(angles[i]), (float(xs[i]), float(ys[i])), True)
+        for i, char in enumerate(text)
+    ]
+
+
+def circle_cells(char_widths: Sequence[int], text: str, font_size: int, spacing, box_width: int, box_height: int, curve_config) -> List[GlyphCell]:
+    radius = curve_config.get("radius", 30)
+    start_angle = curve_config.get("start_angle", 0)
+    widths = np.asarray(char_widths, dtype=np.float64)
+    total_width = widths.sum() + spacing * (len(text) - 1)
+    total_angle = total_width / (2 * math.pi * radius) * 360
+    if total_angle > 300:
+        radius = total_width / (2 * math.pi * (300 / 360))
+        total_angle = 300
+    # Each letter advances the angle by its own width plus spacing.
+    steps = (widths + spacing) / (2 * math.pi * radius) * 360
+    angles = start_angle - total_angle / 2 + np.concatenate(([0.0], np.cumsum(steps)[:-1]))
+    radians = np.radians(angles)
+    xs = box_width // 2 + radius * np.cos(radians)
+    ys = box_height // 2 + radius * np.sin(radians)
+    height = font_size + CIRCLE_CELL_PADDING * 2
+    return [
+        GlyphCell(char, char_widths[i] + CIRCLE_CELL_PADDING * 2, height, CIRCLE_CELL_PADDING, float(angles[i]) + 90, (float(xs[i]), float(ys[i])), False)
+        for i, char in enumerate(text)
+    ]
+
+
+def arc_angles(char_widths: Sequence[int], spacing, radius) -> np.ndarray:
+    """Angle (radians) of each letter of an arc, from a prefix sum of the widths before it."""
+    widths = np.asarray(char_widths, dtype=np.float64)
+    total_width = widths.sum() + spacing * (len(widths) - 1)
+    total_char_angle = total_width * 1.2 / radius
+    before = np.concatenate(([0.0], np.cumsum(widths)[:-1]))[:len(widths)] + spacing * np.arange(len(widths))
+    return -total_char_angle / 2 + before / total_width * total_char_angle
+
+
+def _rotation(width: int, height: int, angle: float) -> Tuple[Tuple[int, int], Tuple[float, ...]]:
+    """Output size and output->input affine matrix of Image.rotate(angle, expand=True).
+
+    Mirrors PIL's own computation (fast paths included) so placements match it
+    pixel for pixel under NEAREST sampling.
+    """
+    angle = angle % 360.0
+    if angle == 0:
+        return (width, height), (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+    if angle == 180:
+        return (width, height), (-1.0, 0.0, float(width), 0.0, -1.0, float(height))
+    if angle == 90:
+        return (height, width), (0.0, -1.0, float(width), 1.0, 0.0, 0.0)
+    if angle == 270:
+        return (height, width), (0.0, 1.0, 0.0, -1.0, 0.0, float(height))
+
+    radians = -math.radians(angle)
+    a, b = round(math.cos(radians), 15), round(math.sin(radians), 15)
+    d, e = round(-math.sin(radians), 15), round(math.cos(radians), 15)
+    cx, cy = width / 2, height / 2
+    c = a * -cx + b * -cy + cx
+    f = d * -cx + e * -cy + cy
+    xs, ys = [], []
+    for x, y in ((0, 0), (width, 0), (width, height), (0, height)):
+        xs.append(a * x + b * y + c)
+        ys.append(d * x + e * y + f)
+    new_width = math.ceil(max(xs)) - math.floor(min(xs))
+    new_height = math.ceil(max(ys)) - math.floor(min(ys))
+    shift_x, shift_y = -(new_width - width) / 2.0, -(new_height - height) / 2.0
+    c, f = a * shift_x + b * shift_y + c, d * shift_x + e * shift_y + f
+    return (new_width, new_height), (a, b, c, d, e, f)
+
+
+def _font_id(font):
+    return file_digest(font.path) if isinstance(font.path, str) else id(font)
+
+
+def _subpixel(value: float) -> Tuple[int, bool]:
+    # Pillow hands FreeType the pen fraction rounded to 1/64 px (half away
+    # from zero) and widens the bitmap by ceil(fraction); nothing else of it
+    # reaches the mask.
+    return int(math.copysign(math.floor(abs(value) * 64 + 0.5), value)), value > 0
+
+
+def _rasterize(font, char: str, start: Tuple[float, float]) -> Tuple[Image.Image, Tuple[int, int]]:
+    core, offset = font.getmask2(char, "L", start=start)
+    # getmask2 hands back a bare imaging core; copy it into a public Image.
+    return Image.frombytes("L", core.size, bytes(core)), offset
+
+
+def glyph_mask(font, char: str, position: Tuple[float, float], outline: int = 0) -> Tuple[Image.Image, Tuple[int, int]]:
+    """Coverage mask of draw.text(position, char), grown by outline px, and where its top-left lands.
+
+    Masks are cached per font, size, char, outline and subpixel class of the
+    position; draw.bitmap() of the mask gives exactly what draw.text() drew.
+    """
+    x, y = position
+    start = (math.modf(x)[0], math.modf(y)[0])
+    key = ("mask", _font_id(font), font.size, char, _subpixel(start[0]), _subpixel(start[1]), outline)
+    if outline > 0:
+        mask, (left, top) = get_glyph(key, lambda: dilate_text_mask(*glyph_mask(font, char, start), outline))
+    else:
+        mask, (left, top) = get_glyph(key, lambda: _rasterize(font, char, start))
+    return mask, (int(x) + left, int(y) + top)
+
+
+def draw_glyph(draw: ImageDraw.ImageDraw, char: str, position: Tuple[float, float], font, fill, outline: int = 0) -> None:
+    """draw.text(position, char, font=font, fill=fill) from the cached mask (grown by outline px)."""
+    mask, origin = glyph_mask(font, char, position, outline)
+    draw.bitmap(origin, mask, fill=fill)
+
+
+def _build_sprite(font, char: str, fill, border_color, border_width: int, window: Box) -> Tuple[Image.Image, Tuple[int, int]]:
+    layers = [glyph_mask(font, char, (0, 0)) + (fill,)]
+    if border_width > 0:
+        layers.insert(0, glyph_mask(font, char, (0, 0), border_width) + (border_color,))
+    outer, (left, top), _ = layers[0]
+    sprite = Image.new("RGBA", outer.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+    for layer, (x, y), color in layers:
+        draw.bitmap((x - left, y - top), layer, fill=color)
+    # Anything outside the cell was clipped by the old per-letter sub-image.
+    clip = (window[0] - left, window[1] - top, window[2] - left, window[3] - top)
+    clip = (max(0, clip[0]), max(0, clip[1]), min(sprite.width, clip[2]), min(sprite.height, clip[3]))
+    if clip != (0, 0, sprite.width, sprite.height):
+        sprite = sprite.crop(clip)
+        left, top = left + clip[0], top + clip[1]
+    return sprite, (left, top)
+
+
+def glyph_sprite(font, cell: GlyphCell, fill, border_color=None, border_width: int = 0) -> Tuple[Image.Image, Tuple[int, int]]:
+    """The letter drawn at the cell's text origin with its outline, and the sprite's offset from that origin."""
+    border_width = border_width if border_color is not None else 0
+    window = (-cell.padding, -cell.padding, cell.width - cell.padding, cell.height - cell.padding)
+    key = ("sprite", _font_id(font), font.size, cell.char, tuple(fill), tuple(border_color or ()), border_width, window)
+    return get_glyph(key, lambda: _build_sprite(font, cell.char, fill, border_color, border_width, window))
+
+
+def _fixed(value: float) -> int:
+    return math.floor(value * 65536.0 + 0.5)
+
+
+def place_glyph(sprite: Image.Image, sprite_offset: Tuple[int, int], cell: GlyphCell) -> Optional[PlacedGlyph]:
+    """Rotate sprite onto the canvas the way rotate(expand=True) + paste placed the whole cell."""
+    if sprite.width == 0 or sprite.height == 0:
+        return None
+    (rotated_width, rotated_height), (a, b, c, d, e, f) = _rotation(cell.width, cell.height, -cell.angle)
+    center_x, center_y = cell.center
+    if cell.round_position:
+        cell_x = int(round(center_x - rotated_width // 2))
+        cell_y = int(round(center_y - rotated_height // 2))
+    else:
+        cell_x = int(center_x - rotated_width // 2)
+        cell_y = int(center_y - rotated_height // 2)
+
+    # Sprite coordinates in the cell, then the canvas box they rotate into.
+    sprite_x = cell.padding + sprite_offset[0]
+    sprite_y = cell.padding + sprite_offset[1]
+    det = a * e - b * d
+    xs, ys = [], []
+    for x, y in ((0, 0), (sprite.width, 0), (sprite.width, sprite.height), (0, sprite.height)):
+        u, v = x + sprite_x - c, y + sprite_y - f
+        xs.append((e * u - b * v) / det)
+        ys.append((a * v - d * u) / det)
+    left = max(0, math.floor(min(xs)) - 1)
+    top = max(0, math.floor(min(ys)) - 1)
+    right = min(rotated_width, math.ceil(max(xs)) + 1)
+    bottom = min(rotated_height, math.ceil(max(ys)) + 1)
+    if right <= left or bottom <= top:
+        return None
+
+    # Pillow samples NEAREST affine transforms in 16.16 fixed point, stepping
+    # from the top-left of the output. Evaluate that same integer mapping for
+    # just this window, so every pixel lands where rotate() put it.
+    col = np.arange(left, right, dtype=np.int64)[None, :]
+    row = np.arange(top, bottom, dtype=np.int64)[:, None]
+    source_x = ((_fixed(c + a * 0.5 + b * 0.5) + row * _fixed(b) + col * _fixed(a)) >> 16) - sprite_x
+    source_y = ((_fixed(f + d * 0.5 + e * 0.5) + row * _fixed(e) + col * _fixed(d)) >> 16) - sprite_y
+    inside = (source_x >= 0) & (source_x < sprite.width) & (source_y >= 0) & (source_y < sprite.height)
+    pixels = np.zeros((bottom - top, right - left, 4), dtype=np.uint8)
+    pixels[inside] = np.asarray(sprite)[source_y[inside], source_x[inside]]
+    return PlacedGlyph(Image.fromarray(pixels, "RGBA"), (cell_x + left, cell_y + top))
+
+
+def place_glyphs(font, cells: Sequence[GlyphCell], fill, border_color=None, border_width: int = 0) -> List[PlacedGlyph]:
+    placed = []
+    for cell in cells:
+        sprite, offset = glyph_sprite(font, cell, fill, border_color, border_width)
+        glyph = place_glyph(sprite, offset, cell)
+        if glyph is not None:
+            placed.append(glyph)
+    return placed
+
+
+def composite_glyphs(canvas: Image.Image, placed: Sequence[PlacedGlyph], origin: Tuple[int, int] = (0, 0)) -> None:
+    """Paste glyphs in order; origin is the canvas position of the canvas' top-left corner."""
+    for glyph in placed:
+        canvas.paste(glyph.image, (glyph.position[0] - origin[0], glyph.position[1] - origin[1]), glyph.image)
+
+
+def glyphs_extent(placed: Sequence[PlacedGlyph], canvas_size: Tuple[int, int]) -> Optional[Box]:
+    """Union of the glyph boxes, clipped to a canvas of canvas_size."""
+    if not placed:
+        return None
+    left = max(0, min(g.position[0] for g in placed))
+    top = max(0, min(g.position[1] for g in placed))
+    right = min(canvas_size[0], max(g.position[0] + g.image.width for g in placed))
+    bottom = min(canvas_size[1], max(g.position[1] + g.image.height for g in placed))
+    if right <= left or bottom <= top:
+        return None
+    return (left, top, right, bottom)
+
+
+def render_cropped(placed: Sequence[PlacedGlyph], canvas_size: Tuple[int, int], padding: int) -> Image.Image:
+    """What drawing placed onto a canvas_size canvas and cropping to its ink bbox +/- padding gave.
+
+    Only the region the glyphs touch is ever allocated.
+    """
+    extent = glyphs_extent(placed, canvas_size)
+    if extent is None:
+        return Image.new("RGBA", canvas_size, (0, 0, 0, 0))
+    left, top, right, bottom = extent
+    canvas = Image.new("RGBA", (right - left, bottom - top), (0, 0, 0, 0))
+    composite_glyphs(canvas, placed, (left, top))
+    ink = canvas.getbbox()
+    if ink is None:
+        return Image.new("RGBA", canvas_size, (0, 0, 0, 0))
+    crop = (
+        max(0, ink[0] + left - padding),
+        max(0, ink[1] + top - padding),
+        min(canvas_size[0], ink[2] + left + padding),
+        min(canvas_size[1], ink[3] + top + padding),
+    )
+    return canvas.crop((crop[0] - left, crop[1] - top, crop[2] - left, crop[3] - top))